@@ -2,7 +2,20 @@
 # Ebbe Library Enpoint
 # =============================================================================
 #
-from ebbe.benchmark import Timer
+from ebbe.benchmark import (
+    Timer,
+    AccumulatingTimer,
+    Timers,
+    Profiler,
+    LatencyHistogram,
+    BenchmarkResult,
+    run_benchmark,
+    compare_benchmarks,
+    write_benchmarks,
+    save_baseline,
+    load_baseline,
+    check_baseline,
+)
 from ebbe.format import (
     format_int,
     format_time,
@@ -11,13 +24,18 @@ from ebbe.format import (
     format_repr,
     format_filesize,
 )
+from ebbe.sets import BloomFilter, RecentSet, DigestSet
 from ebbe.func import compose, rcompose, count_arity, noop
 from ebbe.iter import (
     as_chunks,
     as_reconciled_chunks,
     outer_zip,
     as_grams,
+    as_multi_grams,
+    as_strided_grams,
+    as_hashed_grams,
     fail_fast,
+    prefetch,
     uniq,
     distinct,
     with_prev,
@@ -27,6 +45,7 @@ from ebbe.iter import (
     with_is_last,
     without_first,
     without_last,
+    Pipeline,
 )
 from ebbe.utils import (
     get,
@@ -35,11 +54,17 @@ from ebbe.utils import (
     pathgetter,
     pathsgetter,
     sorted_uniq,
+    external_sorted_uniq,
+    minhash,
     indexed,
     grouped,
     partitioned,
+    parallel_grouped,
+    parallel_partitioned,
     grouped_items,
     partitioned_items,
+    external_grouped,
+    external_grouped_items,
     pick,
     omit,
 )
@@ -0,0 +1,116 @@
+# =============================================================================
+# Ebbe Asynchronous Iterating Functions
+# =============================================================================
+#
+# asyncio counterparts of some of `ebbe.iter` functions.
+#
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import asyncio
+from inspect import isawaitable
+from collections import deque
+
+T = TypeVar("T")
+W = TypeVar("W")
+V = TypeVar("V")
+
+AnyIterable = Union[Iterable[T], AsyncIterable[T]]
+
+
+async def iterate(iterable: AnyIterable[T]) -> AsyncIterator[T]:
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:  # type: ignore
+            yield item
+    else:
+        for item in iterable:  # type: ignore
+            yield item
+
+
+async def as_chunks(size: int, iterable: AnyIterable[T]) -> AsyncIterator[List[T]]:
+    chunk = []
+
+    async for item in iterate(iterable):
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+        chunk.append(item)
+
+    if chunk:
+        yield chunk
+
+
+async def as_reconciled_chunks(
+    size: int,
+    iterable: AnyIterable[T],
+    work: Callable[[List[T]], Union[W, Awaitable[W]]],
+    reconcile: Callable[[W, T], V],
+    *,
+    max_in_flight: int = 1
+) -> AsyncIterator[Tuple[T, V]]:
+    if max_in_flight < 1:
+        raise TypeError("max_in_flight should be >= 1")
+
+    async def run(chunk):
+        data = work(chunk)
+
+        if isawaitable(data):
+            data = await data
+
+        return data
+
+    # NOTE: tasks are awaited in creation order so output order is kept
+    in_flight = deque()
+
+    try:
+        async for chunk in as_chunks(size, iterable):
+            if len(in_flight) >= max_in_flight:
+                done_chunk, task = in_flight.popleft()
+                data = await task
+
+                for item in done_chunk:
+                    yield item, reconcile(data, item)
+
+            in_flight.append((chunk, asyncio.ensure_future(run(chunk))))
+
+        while in_flight:
+            done_chunk, task = in_flight.popleft()
+            data = await task
+
+            for item in done_chunk:
+                yield item, reconcile(data, item)
+
+    finally:
+        for _, task in in_flight:
+            task.cancel()
+
+
+# NOTE: this function makes the following assumptions:
+#   1. the work done is run by a single consumer of the key stream
+#   2. items are emitted in the same order they are given
+async def outer_zip(
+    complex_iterable: AnyIterable[T],
+    key: Callable[[T], W],
+    work: Callable[[AsyncIterator[W]], AsyncIterable[V]],
+) -> AsyncIterator[Tuple[T, V]]:
+    queue = deque()
+
+    async def simple_iterable():
+        async for item in iterate(complex_iterable):
+            queue.append(item)
+            yield key(item)
+
+    async for result in work(simple_iterable()):
+        item = queue.popleft()
+        yield item, result
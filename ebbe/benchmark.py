@@ -2,11 +2,81 @@
 # Ebbe Benchmark Helpers
 # =============================================================================
 #
+import os
+import csv
 import sys
+import json
+import warnings
+from array import array
+from collections import OrderedDict
+from contextvars import ContextVar
+from threading import Lock, get_ident
+from itertools import repeat
+from math import sqrt
+from time import perf_counter_ns
 from timeit import default_timer as timer
-from typing import TextIO
+from typing import (
+    Callable,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    TextIO,
+    NamedTuple,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-from ebbe.format import format_time
+from ebbe.format import format_int, format_time, format_repr
+
+
+def format_duration(duration: float, precision: str = "nanoseconds") -> str:
+    return format_time(
+        duration,
+        precision=precision,
+        unit="seconds",
+        max_items=2,
+        short=True,
+    )
+
+
+OUTPUTS = ("text", "jsonl", "csv")
+
+Record = Dict[str, Any]
+
+
+def check_output(output: str) -> None:
+    if output not in OUTPUTS:
+        raise TypeError(
+            'invalid output "%s", expecting one of %s' % (output, ", ".join(OUTPUTS))
+        )
+
+
+def write_records(
+    records: Iterable[Record], file: TextIO, output: str, header: bool = True
+) -> None:
+    if output == "jsonl":
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False), file=file)
+
+        return
+
+    # NOTE: records may have different shapes, e.g. when mixing timers and
+    # benchmark results, so columns are the union of their fields
+    records = list(records)
+    fieldnames = OrderedDict()
+
+    for record in records:
+        fieldnames.update(OrderedDict.fromkeys(record))
+
+    writer = csv.DictWriter(file, fieldnames=list(fieldnames), restval="")
+
+    if header and records:
+        writer.writeheader()
+
+    writer.writerows(records)
 
 
 class Timer(object):
@@ -15,25 +85,836 @@ class Timer(object):
         name: str = "Timer",
         file: TextIO = sys.stderr,
         precision: str = "nanoseconds",
+        output: str = "text",
     ):
+        check_output(output)
+
         self.name = name
         self.file = file
         self.precision = precision
+        self.output = output
 
     def __enter__(self):
         self.start = timer()
+        return self
 
     def __exit__(self, *args):
         self.end = timer()
         self.duration = self.end - self.start
+
+        if self.output != "text":
+            write_records([self.to_dict()], self.file, self.output, header=False)
+            return
+
         print(
             "%s:" % self.name,
-            format_time(
-                self.duration,
-                precision=self.precision,
-                unit="seconds",
-                max_items=2,
-                short=True,
-            ),
+            format_duration(self.duration, precision=self.precision),
             file=self.file,
         )
+
+    def to_dict(self) -> Record:
+        return {"name": self.name, "duration": self.duration}
+
+
+# NOTE: this timer is meant to be entered a great number of times, e.g. in
+# a hot loop, and only accumulates integer nanoseconds, printing nothing until
+# asked. It is not reentrant: nesting the same timer will corrupt its start.
+class AccumulatingTimer(object):
+    __slots__ = ("name", "start", "total", "count", "min", "max")
+
+    def __init__(self, name: str = "Timer"):
+        self.name = name
+        self.start = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self.total = 0
+        self.count = 0
+        self.min = sys.maxsize
+        self.max = 0
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        elapsed = perf_counter_ns() - self.start
+
+        self.total += elapsed
+        self.count += 1
+
+        if elapsed < self.min:
+            self.min = elapsed
+
+        if elapsed > self.max:
+            self.max = elapsed
+
+    @property
+    def mean(self) -> float:
+        if not self.count:
+            return 0.0
+
+        return self.total / self.count
+
+    def format(self, precision: str = "nanoseconds") -> str:
+        f = lambda ns: format_duration(ns / 1e9, precision=precision)
+
+        if not self.count:
+            return "%s: never called" % self.name
+
+        return "%s: %s total | %s calls | mean %s | min %s | max %s" % (
+            self.name,
+            f(self.total),
+            format_int(self.count),
+            f(self.mean),
+            f(self.min),
+            f(self.max),
+        )
+
+    def __str__(self) -> str:
+        return self.format()
+
+    def __repr__(self):
+        return format_repr(self, ["name", "total", "count"])
+
+    def to_dict(self) -> Record:
+        return {
+            "name": self.name,
+            "duration": self.total / 1e9,
+            "count": self.count,
+            "mean": self.mean / 1e9,
+            "min": self.min / 1e9 if self.count else None,
+            "max": self.max / 1e9 if self.count else None,
+        }
+
+
+class Timers(object):
+    def __init__(self):
+        self.timers: Dict[str, AccumulatingTimer] = {}
+
+    def __call__(self, name: str) -> AccumulatingTimer:
+        t = self.timers.get(name)
+
+        if t is None:
+            t = AccumulatingTimer(name)
+            self.timers[name] = t
+
+        return t
+
+    def __getitem__(self, name: str) -> AccumulatingTimer:
+        return self.timers[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.timers
+
+    def __iter__(self):
+        return iter(self.timers.values())
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def reset(self) -> None:
+        for t in self.timers.values():
+            t.reset()
+
+    def print(
+        self,
+        file: TextIO = sys.stderr,
+        precision: str = "nanoseconds",
+        output: str = "text",
+    ) -> None:
+        check_output(output)
+
+        # NOTE: most expensive sections first
+        timers = sorted(self.timers.values(), key=lambda t: t.total, reverse=True)
+
+        if output != "text":
+            write_records((t.to_dict() for t in timers), file, output)
+            return
+
+        grand_total = sum(t.total for t in timers)
+
+        for t in timers:
+            print(
+                t.format(precision=precision),
+                "| %.1f%%" % (100 * t.total / grand_total if grand_total else 0.0),
+                file=file,
+            )
+
+    def __repr__(self):
+        return format_repr(self, [("names", list(self.timers))])
+
+
+# NOTE: this histogram uses HDR-style log-linear buckets: values are exact
+# below 2 ** precision nanoseconds, then every power of two is split into
+# 2 ** (precision - 1) buckets, which bounds the relative error to about
+# 2 ** (1 - precision) with a fixed amount of memory. Values larger than
+# max_value are clamped into the last bucket. Recording is not thread-safe:
+# concurrent writers must hold the histogram's lock, as `decorators.timed` does.
+class LatencyHistogram(object):
+    def __init__(self, precision: int = 7, max_value: int = 3_600_000_000_000):
+        if precision < 2 or precision > 16:
+            raise TypeError("precision should be between 2 and 16")
+
+        if max_value < 1:
+            raise TypeError("max_value should be >= 1")
+
+        self.precision = precision
+        self.max_value = max_value
+        self.lock = Lock()
+        self.sub_buckets = 1 << precision
+        self.half = self.sub_buckets >> 1
+        self.buckets = array("Q", bytes(8 * (self.bucket_index(max_value) + 1)))
+        self.reset()
+
+    def reset(self) -> None:
+        for i in range(len(self.buckets)):
+            self.buckets[i] = 0
+
+        self.count = 0
+        self.total = 0
+        self.min = sys.maxsize
+        self.max = 0
+
+    def bucket_index(self, value: int) -> int:
+        if value < self.sub_buckets:
+            return value
+
+        shift = value.bit_length() - self.precision
+
+        return self.sub_buckets + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def bucket_bounds(self, index: int) -> Tuple[int, int]:
+        if index < self.sub_buckets:
+            return index, index
+
+        shift, offset = divmod(index - self.sub_buckets, self.half)
+        shift += 1
+        m = offset + self.half
+
+        return m << shift, ((m + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+
+        self.count += 1
+        self.total += value
+
+        if value < self.min:
+            self.min = value
+
+        if value > self.max:
+            self.max = value
+
+        if value > self.max_value:
+            value = self.max_value
+
+        self.buckets[self.bucket_index(value)] += 1
+
+    @property
+    def mean(self) -> float:
+        if not self.count:
+            return 0.0
+
+        return self.total / self.count
+
+    def percentile(self, p: float) -> int:
+        if not self.count:
+            raise TypeError("cannot compute a percentile of an empty histogram")
+
+        if p < 0 or p > 100:
+            raise TypeError("p should be between 0 and 100")
+
+        rank = max(1, -(-self.count * p // 100))
+
+        # NOTE: extremes are known exactly
+        if rank == 1:
+            return self.min
+
+        if rank >= self.count:
+            return self.max
+
+        seen = 0
+
+        for i, c in enumerate(self.buckets):
+            seen += c
+
+            if seen >= rank:
+                lo, hi = self.bucket_bounds(i)
+
+                # NOTE: the midpoint, kept within the exact observed range
+                return min(max((lo + hi) // 2, self.min), self.max)
+
+        return self.max
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if (other.precision, other.max_value) != (self.precision, self.max_value):
+            raise TypeError("cannot merge histograms with different parameters")
+
+        for i, c in enumerate(other.buckets):
+            if c:
+                self.buckets[i] += c
+
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def nbytes(self) -> int:
+        return self.buckets.itemsize * len(self.buckets)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def format(self, precision: str = "nanoseconds") -> str:
+        f = lambda ns: format_duration(ns / 1e9, precision=precision)
+
+        if not self.count:
+            return "no values"
+
+        return "%s values | mean %s | p50 %s | p90 %s | p99 %s | p99.9 %s | max %s" % (
+            format_int(self.count),
+            f(self.mean),
+            f(self.percentile(50)),
+            f(self.percentile(90)),
+            f(self.percentile(99)),
+            f(self.percentile(99.9)),
+            f(self.max),
+        )
+
+    def __str__(self) -> str:
+        return self.format()
+
+    def __repr__(self):
+        return format_repr(self, ["precision", "count", "nbytes"])
+
+    def to_dict(self) -> Record:
+        if not self.count:
+            return {"count": 0}
+
+        return {
+            "count": self.count,
+            "mean": self.mean / 1e9,
+            "min": self.min / 1e9,
+            "p50": self.percentile(50) / 1e9,
+            "p90": self.percentile(90) / 1e9,
+            "p99": self.percentile(99) / 1e9,
+            "p999": self.percentile(99.9) / 1e9,
+            "max": self.max / 1e9,
+        }
+
+
+# NOTE: linear interpolation between closest ranks, on sorted values
+def percentile(values: Sequence[float], p: float) -> float:
+    if not values:
+        raise TypeError("cannot compute a percentile of no values")
+
+    rank = (len(values) - 1) * p / 100
+    lo = int(rank)
+    hi = min(lo + 1, len(values) - 1)
+
+    return values[lo] + (values[hi] - values[lo]) * (rank - lo)
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    iterations: int
+    timings: List[float]
+
+    @property
+    def min(self) -> float:
+        return self.timings[0]
+
+    @property
+    def max(self) -> float:
+        return self.timings[-1]
+
+    @property
+    def mean(self) -> float:
+        return sum(self.timings) / len(self.timings)
+
+    @property
+    def median(self) -> float:
+        return percentile(self.timings, 50)
+
+    @property
+    def stddev(self) -> float:
+        n = len(self.timings)
+
+        if n < 2:
+            return 0.0
+
+        mean = self.mean
+
+        return sqrt(sum((t - mean) ** 2 for t in self.timings) / (n - 1))
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.timings, 95)
+
+    @property
+    def p99(self) -> float:
+        return percentile(self.timings, 99)
+
+    @property
+    def ops_per_second(self) -> float:
+        median = self.median
+
+        if not median:
+            return float("inf")
+
+        return 1 / median
+
+    def format(self, precision: str = "nanoseconds") -> str:
+        f = lambda d: format_duration(d, precision=precision)
+
+        ops = self.ops_per_second
+
+        # NOTE: fields are separated by pipes since formatted times use commas
+        fields = [
+            "mean %s ± %s" % (f(self.mean), f(self.stddev)),
+            "min %s" % f(self.min),
+            "median %s" % f(self.median),
+            "p95 %s" % f(self.p95),
+            "p99 %s" % f(self.p99),
+            "%s ops/s" % ("inf" if ops == float("inf") else format_int(ops)),
+            "%s × %s" % (format_int(len(self.timings)), format_int(self.iterations)),
+        ]
+
+        return "%s: %s" % (self.name, " | ".join(fields))
+
+    def __str__(self) -> str:
+        return self.format()
+
+    def to_dict(self, timings: bool = False) -> Record:
+        ops = self.ops_per_second
+
+        record = {
+            "name": self.name,
+            "rounds": len(self.timings),
+            "iterations": self.iterations,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "median": self.median,
+            "stddev": self.stddev,
+            "p95": self.p95,
+            "p99": self.p99,
+            "ops_per_second": None if ops == float("inf") else ops,
+        }
+
+        if timings:
+            record["timings"] = self.timings
+
+        return record
+
+
+def run_round(fn: Callable[[], Any], iterations: int) -> float:
+    start = timer()
+
+    for _ in repeat(None, iterations):
+        fn()
+
+    return timer() - start
+
+
+# NOTE: same idea as timeit.Timer.autorange, doubling-ish the number of
+# iterations until a single round lasts at least `min_time` seconds.
+def autorange(fn: Callable[[], Any], min_time: float) -> int:
+    i = 1
+
+    while True:
+        for j in (1, 2, 5):
+            iterations = i * j
+
+            if run_round(fn, iterations) >= min_time:
+                return iterations
+
+        i *= 10
+
+
+def run_benchmark(
+    fn: Callable[[], Any],
+    *,
+    name: Optional[str] = None,
+    rounds: int = 10,
+    iterations: Optional[int] = None,
+    warmup: int = 1,
+    min_time: float = 0.05,
+) -> BenchmarkResult:
+    if rounds < 1:
+        raise TypeError("rounds should be >= 1")
+
+    if warmup < 0:
+        raise TypeError("warmup should be >= 0")
+
+    if iterations is not None and iterations < 1:
+        raise TypeError("iterations should be >= 1")
+
+    if name is None:
+        name = getattr(fn, "__name__", repr(fn))
+
+    if iterations is None:
+        iterations = autorange(fn, min_time)
+
+    for _ in range(warmup):
+        run_round(fn, iterations)
+
+    timings = sorted(run_round(fn, iterations) / iterations for _ in range(rounds))
+
+    return BenchmarkResult(name, iterations, timings)
+
+
+def compare_benchmarks(
+    *fns: Callable[[], Any],
+    names: Optional[Sequence[str]] = None,
+    file: Optional[TextIO] = sys.stderr,
+    precision: str = "nanoseconds",
+    output: str = "text",
+    **kwargs,
+) -> List[BenchmarkResult]:
+    check_output(output)
+
+    if len(fns) < 2:
+        raise TypeError("at least two functions are required to compare")
+
+    if names is not None and len(names) != len(fns):
+        raise TypeError("names should have the same length as the functions")
+
+    # NOTE: all functions are run with the same number of iterations, found
+    # using the first one, so that rounds are comparable.
+    iterations = kwargs.pop("iterations", None)
+    results = []
+
+    for i, fn in enumerate(fns):
+        result = run_benchmark(
+            fn,
+            name=names[i] if names is not None else None,
+            iterations=iterations,
+            **kwargs,
+        )
+        iterations = result.iterations
+        results.append(result)
+
+    if file is not None and output != "text":
+        write_benchmarks(results, file, output=output)
+
+    elif file is not None:
+        fastest = min(r.median for r in results)
+
+        for result in results:
+            if result.median == fastest:
+                comparison = "fastest"
+            else:
+                comparison = "x%.2f slower" % (result.median / fastest)
+
+            print(result.format(precision=precision), "|", comparison, file=file)
+
+    return results
+
+
+def write_benchmarks(
+    results: Iterable[Union[BenchmarkResult, Timer, AccumulatingTimer]],
+    file: TextIO = sys.stdout,
+    output: str = "jsonl",
+) -> None:
+    check_output(output)
+
+    if output == "text":
+        for result in results:
+            print(result, file=file)
+
+        return
+
+    write_records((result.to_dict() for result in results), file, output)
+
+
+Baseline = Dict[str, Record]
+
+TIME_METRICS = ("duration", "min", "max", "mean", "median", "p95", "p99")
+
+
+def save_baseline(
+    results: Iterable[Union[BenchmarkResult, Timer, AccumulatingTimer]], path: str
+) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        write_benchmarks(results, f, output="jsonl")
+
+
+def load_baseline(path: str) -> Baseline:
+    baseline = {}
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+
+            if not line:
+                continue
+
+            record = json.loads(line)
+            baseline[record["name"]] = record
+
+    return baseline
+
+
+class Regression(NamedTuple):
+    name: str
+    metric: str
+    baseline: float
+    value: float
+
+    @property
+    def ratio(self) -> float:
+        if not self.baseline:
+            return float("inf")
+
+        return self.value / self.baseline
+
+    def __str__(self) -> str:
+        return "%s: %s went from %s to %s (x%.2f)" % (
+            self.name,
+            self.metric,
+            format_duration(self.baseline),
+            format_duration(self.value),
+            self.ratio,
+        )
+
+
+class BenchmarkRegressionWarning(UserWarning):
+    pass
+
+
+class BenchmarkRegressionError(Exception):
+    def __init__(self, regressions: List[Regression]):
+        self.regressions = regressions
+        super().__init__("; ".join(str(r) for r in regressions))
+
+
+def check_baseline(
+    results: Iterable[Union[BenchmarkResult, Timer, AccumulatingTimer]],
+    baseline: Union[str, Baseline],
+    threshold: float = 0.1,
+    *,
+    metric: Optional[str] = None,
+    strict: bool = False,
+) -> List[Regression]:
+    if threshold < 0:
+        raise TypeError("threshold should be >= 0")
+
+    if metric is not None and metric not in TIME_METRICS:
+        raise TypeError(
+            'invalid metric "%s", expecting one of %s'
+            % (metric, ", ".join(TIME_METRICS))
+        )
+
+    if isinstance(baseline, str):
+        baseline = load_baseline(baseline)
+
+    regressions = []
+
+    for result in results:
+        record = result.to_dict()
+        reference = baseline.get(record["name"])
+
+        # NOTE: results absent from the baseline are new and cannot regress
+        if reference is None:
+            continue
+
+        # NOTE: timers only record a duration, benchmarks default to the median
+        m = metric or ("duration" if "duration" in record else "median")
+
+        if m not in record or m not in reference:
+            raise TypeError('unknown metric "%s" for "%s"' % (m, record["name"]))
+
+        if record[m] > reference[m] * (1 + threshold):
+            regressions.append(Regression(record["name"], m, reference[m], record[m]))
+
+    if regressions:
+        if strict:
+            raise BenchmarkRegressionError(regressions)
+
+        for regression in regressions:
+            warnings.warn(str(regression), BenchmarkRegressionWarning, stacklevel=2)
+
+    return regressions
+
+
+# NOTE: asyncio is slow to import, and if it was never imported there cannot
+# be any running task anyway
+def get_current_task() -> Optional[Any]:
+    asyncio = sys.modules.get("asyncio")
+
+    if asyncio is None:
+        return None
+
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+class Span(object):
+    __slots__ = (
+        "profiler",
+        "name",
+        "parent",
+        "path",
+        "start",
+        "end",
+        "thread",
+        "task_id",
+        "task_name",
+        "children_time",
+        "token",
+    )
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.parent = None
+        self.path = (name,)
+        self.start = 0
+        self.end = None
+        self.thread = None
+        self.task_id = None
+        self.task_name = None
+        self.children_time = 0
+        self.token = None
+
+    @property
+    def duration(self) -> Optional[int]:
+        if self.end is None:
+            return None
+
+        return self.end - self.start
+
+    @property
+    def self_time(self) -> Optional[int]:
+        if self.end is None:
+            return None
+
+        # NOTE: children may overlap when run concurrently from other tasks
+        return max(0, self.end - self.start - self.children_time)
+
+    def __enter__(self):
+        current = self.profiler.current
+        parent = current.get()
+
+        if parent is not None:
+            self.parent = parent
+            self.path = parent.path + (self.name,)
+
+        self.thread = get_ident()
+        task = get_current_task()
+
+        # NOTE: not keeping the task itself so that it can be freed
+        if task is not None:
+            self.task_id = id(task)
+            self.task_name = task.get_name()
+        self.token = current.set(self)
+        self.start = perf_counter_ns()
+
+        return self
+
+    def __exit__(self, *args):
+        self.end = perf_counter_ns()
+        self.profiler.current.reset(self.token)
+        self.token = None
+
+        if self.parent is not None:
+            self.parent.children_time += self.end - self.start
+
+        self.profiler.spans.append(self)
+
+    def __repr__(self):
+        return format_repr(self, ["name", "path", "duration"])
+
+
+COLLAPSED_UNITS = {"nanoseconds": 1, "microseconds": 1000, "milliseconds": 1000000}
+
+
+# NOTE: the current span is tracked using a context variable, so that spans
+# are nested per thread and per asyncio task (tasks inherit the span that was
+# current when they were created).
+class Profiler(object):
+    def __init__(self):
+        self.current: ContextVar[Optional[Span]] = ContextVar(
+            "ebbe_profiler_%i" % id(self), default=None
+        )
+        self.spans: List[Span] = []
+        self.origin = perf_counter_ns()
+
+    def span(self, name: str) -> Span:
+        return Span(self, name)
+
+    def clear(self) -> None:
+        self.spans = []
+
+    def collapsed(self, unit: str = "microseconds") -> Dict[str, int]:
+        divisor = COLLAPSED_UNITS.get(unit)
+
+        if divisor is None:
+            raise TypeError('invalid unit "%s"' % unit)
+
+        stacks: Dict[str, int] = {}
+
+        for span in self.spans:
+            # NOTE: semicolons delimit frames in the collapsed format
+            key = ";".join(name.replace(";", ":") for name in span.path)
+            stacks[key] = stacks.get(key, 0) + span.self_time
+
+        return {k: v // divisor for k, v in stacks.items()}
+
+    def write_collapsed(self, file: TextIO, unit: str = "microseconds") -> None:
+        for stack, value in self.collapsed(unit=unit).items():
+            print(stack, value, file=file)
+
+    def chrome_trace(self) -> Record:
+        pid = os.getpid()
+        lanes: Dict[Any, int] = {}
+        events = []
+
+        for span in sorted(self.spans, key=lambda s: s.start):
+            # NOTE: concurrent tasks of a same thread get their own lane
+            lane = (span.thread, span.task_id, span.task_name)
+            tid = lanes.get(lane)
+
+            if tid is None:
+                tid = len(lanes) + 1
+                lanes[lane] = tid
+
+                if span.task_name is not None:
+                    lane_name = "Thread %i, %s" % (span.thread, span.task_name)
+                else:
+                    lane_name = "Thread %i" % span.thread
+
+                events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": pid,
+                        "tid": tid,
+                        "args": {"name": lane_name},
+                    }
+                )
+
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": (span.start - self.origin) / 1000,
+                    "dur": span.duration / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                }
+            )
+
+        return {"traceEvents": events, "displayTimeUnit": "ns"}
+
+    def write_chrome_trace(self, file: TextIO) -> None:
+        json.dump(self.chrome_trace(), file)
+
+    def __repr__(self):
+        return format_repr(self, [("spans", len(self.spans))])
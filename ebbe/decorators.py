@@ -2,23 +2,135 @@
 # Ebbe Decorators
 # =============================================================================
 #
-from typing import Callable, TypeVar, Iterator, Any
+from typing import Callable, TypeVar, Iterator, Any, NamedTuple, Optional
 from ebbe.types import ParamSpec
 
+from time import perf_counter, perf_counter_ns
 from functools import wraps
+from inspect import isgeneratorfunction
+from itertools import count
 from contextlib import ExitStack
 
-from ebbe.iter import fail_fast as fail
+from ebbe.iter import fail_fast as fail, prefetch as read_ahead
+from ebbe.benchmark import LatencyHistogram
 
 T = TypeVar("T")
 P = ParamSpec("P")
 
 
-def fail_fast() -> Callable[[Callable[P, Iterator[T]]], Callable[P, Iterator[T]]]:
+class GeneratorStats(NamedTuple):
+    name: str
+    items: int
+    time_to_first_item: Optional[float]
+    production_time: float
+    duration: float
+
+    # NOTE: items per second spent inside the generator, consumer time excluded
+    @property
+    def throughput(self) -> Optional[float]:
+        if not self.production_time:
+            return None
+
+        return self.items / self.production_time
+
+
+class MonitoredIterator(Iterator[T]):
+    def __init__(
+        self,
+        name: str,
+        iterator: Iterator[T],
+        hook: Callable[[GeneratorStats], Any],
+        start: float,
+    ):
+        self.name = name
+        self.iterator = iterator
+        self.hook = hook
+        self.start = start
+        self.items = 0
+        self.time_to_first_item = None
+        self.production_time = 0.0
+        self.done = False
+
+    def __next__(self) -> T:
+        if self.done:
+            raise StopIteration
+
+        t = perf_counter()
+
+        try:
+            item = next(self.iterator)
+        except BaseException:
+            self.production_time += perf_counter() - t
+            self.finish()
+            raise
+
+        now = perf_counter()
+        self.production_time += now - t
+
+        if self.time_to_first_item is None:
+            self.time_to_first_item = now - self.start
+
+        self.items += 1
+
+        return item
+
+    def finish(self) -> None:
+        if self.done:
+            return
+
+        self.done = True
+        self.hook(
+            GeneratorStats(
+                self.name,
+                self.items,
+                self.time_to_first_item,
+                self.production_time,
+                perf_counter() - self.start,
+            )
+        )
+
+    def close(self) -> None:
+        close = getattr(self.iterator, "close", None)
+
+        if close is not None:
+            close()
+
+        self.finish()
+
+
+def fail_fast(
+    warmup: int = 1, hook: Optional[Callable[[GeneratorStats], Any]] = None
+) -> Callable[[Callable[P, Iterator[T]]], Callable[P, Iterator[T]]]:
+    def wrapper(fn: Callable[P, Iterator[T]]) -> Callable[P, Iterator[T]]:
+        if hook is None:
+
+            @wraps(fn)
+            def wrapped(*args: P.args, **kwargs: P.kwargs) -> Iterator[T]:
+                return fail(fn(*args, **kwargs), warmup)
+
+            return wrapped
+
+        name = fn.__qualname__
+
+        @wraps(fn)
+        def monitored(*args: P.args, **kwargs: P.kwargs) -> Iterator[T]:
+            start = perf_counter()
+            iterator = MonitoredIterator(name, iter(fn(*args, **kwargs)), hook, start)
+
+            return fail(iterator, warmup)
+
+        return monitored
+
+    return wrapper
+
+
+def prefetch(
+    size: int = 1,
+) -> Callable[[Callable[P, Iterator[T]]], Callable[P, Iterator[T]]]:
     def wrapper(fn: Callable[P, Iterator[T]]) -> Callable[P, Iterator[T]]:
         @wraps(fn)
         def wrapped(*args: P.args, **kwargs: P.kwargs) -> Iterator[T]:
-            return fail(fn(*args, **kwargs))
+            return read_ahead(fn(*args, **kwargs), size)
 
         return wrapped
 
@@ -42,4 +154,89 @@ def with_defer() -> Callable[[F], F]:
     return wrapper
 
 
-__all__ = ["fail_fast", "with_defer"]
+# NOTE: only one call out of `sample` is timed, using a shared counter, so
+# that untimed calls only pay for a counter increment. For generator
+# functions, each yielded item counts as a call and its production is timed.
+def timed(
+    histogram: Optional[LatencyHistogram] = None, *, sample: int = 1
+) -> Callable[[F], F]:
+    if sample < 1:
+        raise TypeError("sample should be >= 1")
+
+    if histogram is None:
+        histogram = LatencyHistogram()
+
+    def wrapper(fn: F) -> F:
+        ticks = count()
+        record = histogram.record
+
+        # NOTE: recording is not atomic, so concurrent callers would lose
+        # updates. The histogram's lock is only taken on sampled calls.
+        lock = histogram.lock
+
+        if isgeneratorfunction(fn):
+            # NOTE: values and exceptions given through `send` and `throw` are
+            # forwarded to the wrapped generator
+            @wraps(fn)
+            def timed_generator(*args, **kwargs):
+                iterator = fn(*args, **kwargs)
+                value = None
+                error = None
+
+                try:
+                    while True:
+                        timing = not next(ticks) % sample
+
+                        if timing:
+                            t = perf_counter_ns()
+
+                        try:
+                            if error is not None:
+                                e, error = error, None
+                                item = iterator.throw(e)
+                            else:
+                                item = iterator.send(value)
+                        except StopIteration as e:
+                            return e.value
+
+                        if timing:
+                            elapsed = perf_counter_ns() - t
+
+                            with lock:
+                                record(elapsed)
+
+                        try:
+                            value = yield item
+                        except GeneratorExit:
+                            raise
+                        except BaseException as e:
+                            error = e
+
+                finally:
+                    iterator.close()
+
+            timed_generator.histogram = histogram  # type: ignore
+            return timed_generator  # type: ignore
+
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            if next(ticks) % sample:
+                return fn(*args, **kwargs)
+
+            t = perf_counter_ns()
+
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - t
+
+                with lock:
+                    record(elapsed)
+
+        wrapped.histogram = histogram  # type: ignore
+        return wrapped  # type: ignore
+
+    return wrapper
+
+
+__all__ = ["fail_fast", "prefetch", "with_defer", "timed", "GeneratorStats"]
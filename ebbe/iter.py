@@ -16,29 +16,238 @@ from typing import (
     overload,
 )
 
-from collections import deque
+from os import cpu_count
+from time import monotonic
+from itertools import islice
+from queue import Queue, Empty, Full
+from collections import OrderedDict, deque
+from threading import Event, Semaphore, Thread, get_ident
+from concurrent.futures import Executor
+from weakref import finalize
 
 T = TypeVar("T")
 W = TypeVar("W")
 V = TypeVar("V")
 
+THREADED_ITEM = 0
+THREADED_ERROR = 1
+THREADED_END = 2
+
+AS_CHUNKS_MAX_BUFFER = 1024
+
 
 def empty_generator() -> Iterator:
     yield from ()
 
 
-def as_chunks(size: int, iterable: Iterable[T]) -> Iterator[List[T]]:
+# NOTE: this iterator consumes the given iterable in a background thread,
+# through a queue, so that production can overlap with consumption.
+# Exceptions raised by the iterable are forwarded to the consumer.
+class ThreadedIterator(Iterator[T]):
+    def __init__(self, iterable: Iterable[T], maxsize: int = 0):
+        self.queue = Queue(maxsize)
+        self.stopped = Event()
+        self.done = False
+
+        self.thread = Thread(target=self.produce, args=(iterable,), daemon=True)
+        self.thread.start()
+
+    def put(self, message: Tuple[int, Any]) -> bool:
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(message, timeout=0.1)
+                return True
+            except Full:
+                continue
+
+        return False
+
+    def produce(self, iterable: Iterable[T]) -> None:
+        iterator = iter(iterable)
+
+        try:
+            for item in iterator:
+                if not self.put((THREADED_ITEM, item)):
+                    # NOTE: releasing the source when the consumer gave up
+                    close = getattr(iterator, "close", None)
+
+                    if close is not None:
+                        close()
+
+                    return
+
+        except BaseException as e:
+            self.put((THREADED_ERROR, e))
+            return
+
+        self.put((THREADED_END, None))
+
+    def get(self, timeout: Optional[float] = None) -> T:
+        if self.done:
+            raise StopIteration
+
+        kind, value = self.queue.get(timeout=timeout)
+
+        if kind == THREADED_ITEM:
+            return value
+
+        self.done = True
+
+        if kind == THREADED_ERROR:
+            raise value
+
+        raise StopIteration
+
+    def __next__(self) -> T:
+        return self.get()
+
+    def close(self) -> None:
+        self.stopped.set()
+
+
+# NOTE: executors do not publicly expose their number of workers
+def default_max_in_flight() -> int:
+    return cpu_count() or 1
+
+
+def sliceable_view(iterable: Any) -> Optional[Any]:
+    # NOTE: NumPy arrays and the likes are already sliced as views
+    if hasattr(iterable, "__array_interface__"):
+        return iterable
+
+    try:
+        return memoryview(iterable)
+    except TypeError:
+        return None
+
+
+def as_chunk_views(size: int, iterable: Any) -> Iterator[Any]:
+    view = sliceable_view(iterable)
+
+    if view is not None:
+        for i in range(0, len(view), size):
+            yield view[i : i + size]
+
+        return
+
+    if not isinstance(iterable, Sequence):
+        raise TypeError("views require a sized sequence or a buffer")
+
+    l = len(iterable)
+
+    for i in range(0, l, size):
+        yield range(i, min(i + size, l))
+
+
+def as_chunks(
+    size: Optional[int],
+    iterable: Iterable[T],
+    *,
+    weight: Optional[Callable[[T], float]] = None,
+    max_weight: Optional[float] = None,
+    max_time: Optional[float] = None,
+    views: bool = False,
+) -> Iterator[List[T]]:
+    if size is not None and size < 1:
+        raise TypeError("size should be >= 1")
+
+    if views:
+        if size is None or weight is not None or max_weight is not None:
+            raise TypeError("views can only be used with a size")
+
+        if max_time is not None:
+            raise TypeError("views cannot be used with max_time")
+
+        yield from as_chunk_views(size, iterable)
+        return
+
+    if size is None and max_weight is None and max_time is None:
+        raise TypeError("at least one of size, max_weight or max_time is required")
+
+    # Fast path
+    if weight is None and max_weight is None and max_time is None:
+        chunk = []
+
+        for item in iterable:
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+
+            chunk.append(item)
+
+        if chunk:
+            yield chunk
+
+        return
+
+    if max_weight is not None and weight is None:
+        weight = len  # type: ignore
+
     chunk = []
+    total = 0
 
-    for item in iterable:
-        if len(chunk) == size:
+    if max_time is None:
+        for item in iterable:
+            w = weight(item) if weight is not None else 0
+
+            if chunk and (
+                (size is not None and len(chunk) == size)
+                or (max_weight is not None and total + w > max_weight)
+            ):
+                yield chunk
+                chunk = []
+                total = 0
+
+            chunk.append(item)
+            total += w
+
+        if chunk:
             yield chunk
-            chunk = []
 
-        chunk.append(item)
+        return
+
+    # NOTE: to be able to yield a partial chunk when the source is slow, we
+    # need to consume it in a background thread. Its queue is bounded so that
+    # a slow consumer does not let the thread read the whole source in memory.
+    reader = ThreadedIterator(iterable, maxsize=size or AS_CHUNKS_MAX_BUFFER)
+    deadline = 0.0
+
+    try:
+        while True:
+            timeout = None if not chunk else max(0.0, deadline - monotonic())
+
+            try:
+                item = reader.get(timeout=timeout)
+            except Empty:
+                yield chunk
+                chunk = []
+                total = 0
+                continue
+            except StopIteration:
+                break
+
+            w = weight(item) if weight is not None else 0
+
+            if chunk and (
+                (size is not None and len(chunk) == size)
+                or (max_weight is not None and total + w > max_weight)
+                or monotonic() >= deadline
+            ):
+                yield chunk
+                chunk = []
+                total = 0
+
+            if not chunk:
+                deadline = monotonic() + max_time
+
+            chunk.append(item)
+            total += w
+
+        if chunk:
+            yield chunk
 
-    if chunk:
-        yield chunk
+    finally:
+        reader.close()
 
 
 def as_reconciled_chunks(
@@ -46,34 +255,129 @@ def as_reconciled_chunks(
     iterable: Iterable[T],
     work: Callable[[List[T]], W],
     reconcile: Callable[[W, T], V],
+    *,
+    executor: Optional[Executor] = None,
+    max_in_flight: Optional[int] = None,
 ) -> Iterator[Tuple[T, V]]:
-    for chunk in as_chunks(size, iterable):
-        data = work(chunk)
+    if executor is None:
+        for chunk in as_chunks(size, iterable):
+            data = work(chunk)
+
+            for item in chunk:
+                reconciled = reconcile(data, item)
+
+                yield item, reconciled
+
+        return
+
+    # NOTE: work is typically I/O-bound, so the caller must decide how many
+    # chunks can be worked on at once
+    if max_in_flight is None:
+        raise TypeError("max_in_flight is required when an executor is given")
+
+    if max_in_flight < 1:
+        raise TypeError("max_in_flight should be >= 1")
+
+    # NOTE: futures are consumed in submission order so output order is kept
+    in_flight = deque()
+
+    def flush():
+        chunk, future = in_flight.popleft()
+        data = future.result()
 
         for item in chunk:
-            reconciled = reconcile(data, item)
+            yield item, reconcile(data, item)
+
+    try:
+        for chunk in as_chunks(size, iterable):
+            if len(in_flight) >= max_in_flight:
+                yield from flush()
+
+            in_flight.append((chunk, executor.submit(work, chunk)))
 
-            yield item, reconciled
+        while in_flight:
+            yield from flush()
 
+    finally:
+        for _, future in in_flight:
+            future.cancel()
 
-# NOTE: this function makes the following assumptions:
+
+# NOTE: unless `tagged=True`, this function makes the following assumptions:
 #   1. the work done is single-threaded
 #   2. items are emitted in the same order they are given
 def outer_zip(
     complex_iterable: Iterable[T],
     key: Callable[[T], W],
-    work: Callable[[Iterator[W]], Iterator[V]],
+    work: Callable[[Iterator[Any]], Iterator[Any]],
+    *,
+    tagged: bool = False,
+    ordered: bool = True,
+    buffer_size: Optional[int] = None,
 ) -> Iterator[Tuple[T, V]]:
-    queue = deque()
+    if not tagged:
+        queue = deque()
+
+        def simple_iterable():
+            for item in complex_iterable:
+                queue.append(item)
+                yield key(item)
+
+        for result in work(simple_iterable()):
+            item = queue.popleft()
+            yield item, result
+
+        return
+
+    if buffer_size is not None and buffer_size < 1:
+        raise TypeError("buffer_size should be >= 1")
+
+    # NOTE: `work` receives (index, key) pairs and must emit (index, result)
+    # pairs, in any order, possibly from other threads. The semaphore bounds
+    # the number of items consumed but not yet yielded.
+    pending = {}
+    slots = Semaphore(buffer_size) if buffer_size is not None else None
+    consumer = get_ident()
+
+    def tagged_iterable():
+        for i, item in enumerate(complex_iterable):
+            # NOTE: blocking in the consumer's thread would deadlock
+            if slots is not None and not slots.acquire(get_ident() != consumer):
+                raise RuntimeError(
+                    "work consumed more than buffer_size=%i items without emitting"
+                    % buffer_size
+                )
+
+            pending[i] = item
+            yield i, key(item)
+
+    if not ordered:
+        for i, result in work(tagged_iterable()):
+            item = pending.pop(i)
+
+            if slots is not None:
+                slots.release()
 
-    def simple_iterable():
-        for item in complex_iterable:
-            queue.append(item)
-            yield key(item)
+            yield item, result
 
-    for result in work(simple_iterable()):
-        item = queue.popleft()
-        yield item, result
+        return
+
+    # Reorder buffer
+    results = {}
+    next_index = 0
+
+    for i, result in work(tagged_iterable()):
+        results[i] = result
+
+        while next_index in results:
+            result = results.pop(next_index)
+            item = pending.pop(next_index)
+            next_index += 1
+
+            if slots is not None:
+                slots.release()
+
+            yield item, result
 
 
 @overload
@@ -96,11 +400,39 @@ def as_grams(size: int, iterable: Iterable[T]) -> Iterator[Tuple[T]]:
     ...
 
 
+@overload
+def as_grams(size: int, iterable: Any, *, views: bool) -> Iterator[Any]:
+    ...
+
+
 def as_grams(
-    size: int, iterable: Union[Iterable[T], Sequence[T]]
-) -> Union[Iterator[str], Iterator[List[T]], Iterator[Tuple[T]], Iterator[Sequence[T]]]:
+    size: int, iterable: Union[Iterable[T], Sequence[T]], *, views: bool = False
+) -> Union[
+    Iterator[str], Iterator[List[T]], Iterator[Tuple[T]], Iterator[Sequence[T]], Any
+]:
+    # Views over buffers, or index ranges over sized sequences
+    if views:
+        view = sliceable_view(iterable)
+
+        if view is None:
+            if not isinstance(iterable, Sequence):
+                raise TypeError("views require a sized sequence or a buffer")
+
+            view = range(len(iterable))
+
+        l = len(view)
+
+        if l == 0:
+            return
+
+        if l < size:
+            yield view[:]
+
+        for i in range(l - size + 1):
+            yield view[i : i + size]
+
     # For sized sequences
-    if isinstance(iterable, Sequence):
+    elif isinstance(iterable, Sequence):
         l = len(iterable)
 
         if l == 0:
@@ -134,21 +466,162 @@ def as_grams(
         yield tuple(i for i in buffer)
 
 
-def fail_fast(iterable: Iterable[T]) -> Iterator[T]:
+def as_multi_grams(
+    sizes: Iterable[int], iterable: Union[Iterable[T], Sequence[T]]
+) -> Union[Iterator[str], Iterator[List[T]], Iterator[Tuple[T]], Iterator[Sequence[T]]]:
+    sizes = sorted(set(sizes))
+
+    if not sizes or sizes[0] < 1:
+        raise TypeError("sizes should be a non-empty iterable of ints >= 1")
+
+    # NOTE: grams are emitted by ending position, then by increasing size
+    # For sized sequences
+    if isinstance(iterable, Sequence):
+        l = len(iterable)
+
+        if l == 0:
+            return
+
+        for j in range(1, l + 1):
+            for size in sizes:
+                if size > j:
+                    break
+
+                yield iterable[j - size : j]
+
+        # Same as `as_grams`, when the iterable is shorter than the gram size
+        for size in sizes:
+            if size > l:
+                yield iterable[:]
+
+    # For lazy iterables
+    else:
+        buffer = deque(maxlen=sizes[-1])
+
+        for item in iterable:
+            buffer.append(item)
+            n = len(buffer)
+
+            for size in sizes:
+                if size > n:
+                    break
+
+                yield tuple(islice(buffer, n - size, None))
+
+        n = len(buffer)
+
+        if n == 0:
+            return
+
+        for size in sizes:
+            if size > n:
+                yield tuple(buffer)
+
+
+def as_strided_grams(size: int, array: Any) -> Any:
+    import numpy as np
+    from numpy.lib.stride_tricks import as_strided
+
+    if size < 1:
+        raise TypeError("size should be >= 1")
+
+    # NOTE: buffers such as `array.array` are wrapped without copy
+    a = np.asarray(array)
+
+    if a.ndim != 1:
+        raise TypeError("expecting a one-dimensional array")
+
+    rows = max(0, a.shape[0] - size + 1)
+    stride = a.strides[0]
+
+    return as_strided(a, shape=(rows, size), strides=(stride, stride), writeable=False)
+
+
+MERSENNE_PRIME_61 = (1 << 61) - 1
+
+
+def as_hashed_grams(
+    size: int,
+    iterable: Iterable[T],
+    *,
+    key: Optional[Callable[[T], int]] = None,
+    base: int = 1000003,
+    modulus: int = MERSENNE_PRIME_61,
+) -> Iterator[int]:
+    if size < 1:
+        raise TypeError("size should be >= 1")
+
+    if key is None:
+        key = ord if isinstance(iterable, str) else hash  # type: ignore
+
+    # Rabin-Karp rolling polynomial hash
+    power = pow(base, size - 1, modulus)
+    buffer = deque()
+    h = 0
+
+    for item in iterable:
+        x = key(item) % modulus  # type: ignore
+
+        if len(buffer) == size:
+            h = (h - buffer.popleft() * power) % modulus
+
+        h = (h * base + x) % modulus
+        buffer.append(x)
+
+        if len(buffer) == size:
+            yield h
+
+    # Same as `as_grams`, when the iterable is shorter than the gram size
+    if 0 < len(buffer) < size:
+        yield h
+
+
+def fail_fast(iterable: Iterable[T], warmup: int = 1) -> Iterator[T]:
+    if warmup < 1:
+        raise TypeError("warmup should be >= 1")
+
     iterator = iter(iterable)
+    buffer = list(islice(iterator, warmup))
 
-    try:
-        first_item = next(iterator)
-    except StopIteration:
+    if not buffer:
         return empty_generator()
 
     def generator():
-        yield first_item
-        yield from iterator
+        try:
+            yield from buffer
+            yield from iterator
+
+        # NOTE: closing before reaching the iterator must still close it
+        finally:
+            close = getattr(iterator, "close", None)
+
+            if close is not None:
+                close()
 
     return generator()
 
 
+def prefetch(iterable: Iterable[T], size: int = 1) -> Iterator[T]:
+    if size < 1:
+        raise TypeError("size should be >= 1")
+
+    reader = ThreadedIterator(iterable, maxsize=size)
+
+    def generator():
+        try:
+            yield from reader
+        finally:
+            reader.close()
+
+    gen = generator()
+
+    # NOTE: reading ahead starts right away, so the reader must also be
+    # stopped if the generator is dropped without ever being advanced
+    finalize(gen, reader.close)
+
+    return gen
+
+
 def uniq(
     iterable: Iterable[T], *, key: Optional[Callable[[T], Any]] = None
 ) -> Iterator[T]:
@@ -172,9 +645,12 @@ def uniq(
 
 
 def distinct(
-    iterable: Iterable[T], *, key: Optional[Callable[[T], Any]] = None
+    iterable: Iterable[T],
+    factory: Callable[[], Any] = set,
+    *,
+    key: Optional[Callable[[T], Any]] = None,
 ) -> Iterator[T]:
-    already_seen = set()
+    already_seen = factory()
 
     for item in iterable:
         k = item
@@ -269,3 +745,228 @@ def without_last(iterable: Iterable[T]) -> Iterator[T]:
             break
 
         yield item
+
+
+# NOTE: pipelines are compiled into a single generator function, by inlining
+# the code of each stage into one loop, so that we only pay for one frame
+# instead of one generator per stage. Stages that buffer items (e.g.
+# `with_is_last`) have their downstream code inlined twice, once in the loop
+# and once after it to flush their buffer.
+# NOTE: python's tokenizer cannot handle more than 100 indentation levels
+PIPELINE_MAX_DEPTH = 99
+
+
+class Pipeline(object):
+    def __init__(self, stages: Optional[List[Tuple[str, dict]]] = None):
+        self.stages = stages or []
+        self.fused = None
+
+    def add(self, name: str, **kwargs) -> "Pipeline":
+        return Pipeline(self.stages + [(name, kwargs)])
+
+    def map(self, fn: Callable[[Any], Any]) -> "Pipeline":
+        return self.add("map", fn=fn)
+
+    def filter(self, fn: Callable[[Any], Any]) -> "Pipeline":
+        return self.add("filter", fn=fn)
+
+    def uniq(self, *, key: Optional[Callable[[Any], Any]] = None) -> "Pipeline":
+        return self.add("uniq", key=key)
+
+    def distinct(
+        self,
+        factory: Callable[[], Any] = set,
+        *,
+        key: Optional[Callable[[Any], Any]] = None,
+    ) -> "Pipeline":
+        return self.add("distinct", factory=factory, key=key)
+
+    def with_prev(self) -> "Pipeline":
+        return self.add("with_prev")
+
+    def with_next(self) -> "Pipeline":
+        return self.add("with_next")
+
+    def with_prev_and_next(self) -> "Pipeline":
+        return self.add("with_prev_and_next")
+
+    def with_is_first(self) -> "Pipeline":
+        return self.add("with_is_first")
+
+    def with_is_last(self) -> "Pipeline":
+        return self.add("with_is_last")
+
+    def without_first(self) -> "Pipeline":
+        return self.add("without_first")
+
+    def without_last(self) -> "Pipeline":
+        return self.add("without_last")
+
+    def as_chunks(self, size: int) -> "Pipeline":
+        if size < 1:
+            raise TypeError("size should be >= 1")
+
+        return self.add("as_chunks", size=size)
+
+    def source(self) -> Tuple[str, dict]:
+        stages = self.stages
+        namespace = {}
+        init = []
+
+        def block(lines, depth):
+            return ["    " * depth + line for line in lines]
+
+        def emit(i, var, depth):
+            if i == len(stages):
+                return block(["yield %s" % var], depth)
+
+            name, kwargs = stages[i]
+            y = "y%i" % i
+            down = lambda v, d=depth: emit(i + 1, v, d)
+
+            if name == "map":
+                namespace["fn%i" % i] = kwargs["fn"]
+                return block(["%s = fn%i(%s)" % (y, i, var)], depth) + down(y)
+
+            if name == "filter":
+                namespace["fn%i" % i] = kwargs["fn"]
+                return block(["if fn%i(%s):" % (i, var)], depth) + down(var, depth + 1)
+
+            if name == "uniq" or name == "distinct":
+                key = kwargs["key"]
+
+                if key is not None:
+                    namespace["key%i" % i] = key
+                    lines = ["k%i = key%i(%s)" % (i, i, var)]
+                else:
+                    lines = ["k%i = %s" % (i, var)]
+
+                if name == "uniq":
+                    init.extend(["first%i = True" % i, "last%i = None" % i])
+                    lines += [
+                        "if first%i or not (last%i == k%i):" % (i, i, i),
+                        "    first%i = False" % i,
+                        "    last%i = k%i" % (i, i),
+                    ]
+                else:
+                    namespace["factory%i" % i] = kwargs["factory"]
+                    init.append("seen%i = factory%i()" % (i, i))
+                    lines += [
+                        "if k%i not in seen%i:" % (i, i),
+                        "    seen%i.add(k%i)" % (i, i),
+                    ]
+
+                return block(lines, depth) + down(var, depth + 1)
+
+            if name == "with_prev":
+                init.append("prev%i = None" % i)
+                lines = ["%s = (prev%i, %s)" % (y, i, var), "prev%i = %s" % (i, var)]
+                return block(lines, depth) + down(y)
+
+            if name == "with_is_first":
+                init.append("first%i = True" % i)
+                lines = ["%s = (first%i, %s)" % (y, i, var), "first%i = False" % i]
+                return block(lines, depth) + down(y)
+
+            if name == "without_first":
+                init.append("first%i = True" % i)
+                lines = ["if first%i:" % i, "    first%i = False" % i, "else:"]
+                return block(lines, depth) + down(var, depth + 1)
+
+            if name == "as_chunks":
+                namespace["size%i" % i] = kwargs["size"]
+                init.append("chunk%i = []" % i)
+                lines = [
+                    "if len(chunk%i) == size%i:" % (i, i),
+                    "    %s = chunk%i" % (y, i),
+                    "    chunk%i = [%s]" % (i, var),
+                ]
+                tail = ["else:", "    chunk%i.append(%s)" % (i, var)]
+                return block(lines, depth) + down(y, depth + 1) + block(tail, depth)
+
+            # Stages buffering the last item
+            init.extend(["has%i = False" % i, "last%i = None" % i])
+
+            if name == "with_next":
+                value = "(last%i, %s)" % (i, var)
+            elif name == "with_is_last":
+                value = "(False, last%i)" % i
+            elif name == "without_last":
+                value = "last%i" % i
+            elif name == "with_prev_and_next":
+                init.append("prev%i = None" % i)
+                value = "(prev%i, last%i, %s)" % (i, i, var)
+            else:
+                raise TypeError('unknown stage "%s"' % name)
+
+            lines = ["if has%i:" % i, "    %s = %s" % (y, value)]
+
+            if name == "with_prev_and_next":
+                lines.append("    prev%i = last%i" % (i, i))
+
+            lines.append("    last%i = %s" % (i, var))
+            tail = ["else:", "    has%i = True" % i, "    last%i = %s" % (i, var)]
+
+            return block(lines, depth) + down(y, depth + 1) + block(tail, depth)
+
+        def emit_end(i, depth):
+            if i == len(stages):
+                return []
+
+            name = stages[i][0]
+            y = "y%i" % i
+
+            if name == "as_chunks":
+                flushed = "chunk%i" % i
+                condition = "chunk%i" % i
+            elif name == "with_next":
+                flushed = "(last%i, None)" % i
+                condition = "has%i" % i
+            elif name == "with_is_last":
+                flushed = "(True, last%i)" % i
+                condition = "has%i" % i
+            elif name == "with_prev_and_next":
+                flushed = "(prev%i, last%i, None)" % (i, i)
+                condition = "has%i" % i
+            else:
+                return emit_end(i + 1, depth)
+
+            lines = ["if %s:" % condition, "    %s = %s" % (y, flushed)]
+
+            return (
+                block(lines, depth) + emit(i + 1, y, depth + 1) + emit_end(i + 1, depth)
+            )
+
+        body = emit(0, "item", 2)
+        end = emit_end(0, 1)
+
+        # NOTE: stages can be inlined several times, hence the deduplication
+        lines = ["def fused(iterable):"]
+        lines += block(list(OrderedDict.fromkeys(init)), 1)
+        lines += ["    for item in iterable:"]
+        lines += body
+        lines += end
+
+        return "\n".join(lines) + "\n", namespace
+
+    def compile(self) -> Callable[[Iterable[Any]], Iterator[Any]]:
+        code, namespace = self.source()
+
+        # NOTE: most stages nest the downstream ones one level deeper
+        depth = max((len(l) - len(l.lstrip(" "))) // 4 for l in code.splitlines())
+
+        if depth > PIPELINE_MAX_DEPTH:
+            raise TypeError(
+                "pipeline has too many nesting stages (%i levels of indentation "
+                "needed, python supports at most %i)" % (depth, PIPELINE_MAX_DEPTH)
+            )
+
+        exec(compile(code, "<ebbe.Pipeline>", "exec"), namespace)
+
+        return namespace["fused"]
+
+    def __call__(self, iterable: Iterable[Any]) -> Iterator[Any]:
+        if self.fused is None:
+            self.fused = self.compile()
+
+        return self.fused(iterable)
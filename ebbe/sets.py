@@ -0,0 +1,308 @@
+# =============================================================================
+# Ebbe Set-like Data Structures
+# =============================================================================
+#
+# Compact or bounded alternatives to python's `set`, mostly meant to be used
+# as factories for `distinct`.
+#
+from typing import Any, Callable, Generic, Hashable, Optional, Tuple, TypeVar, Union
+
+from math import ceil, log
+from time import monotonic
+from array import array
+from hashlib import blake2b
+from collections import OrderedDict
+
+from ebbe.format import format_repr
+
+T = TypeVar("T", bound=Hashable)
+
+LN2 = log(2)
+UINT64_MASK = (1 << 64) - 1
+SECOND_HASH_SALT = 0x9E3779B97F4A7C15
+
+
+class BloomFilter(Generic[T]):
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        if capacity < 1:
+            raise TypeError("capacity should be >= 1")
+
+        if not 0 < error_rate < 1:
+            raise TypeError("error_rate should be > 0 and < 1")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        self.size = max(8, ceil(-capacity * log(error_rate) / (LN2 * LN2)))
+        self.hashes = max(1, round(self.size / capacity * LN2))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item: T):
+        h = hash(item)
+        h1 = h & UINT64_MASK
+        h2 = hash((h, SECOND_HASH_SALT)) & UINT64_MASK | 1
+
+        size = self.size
+
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % size
+
+    def add(self, item: T) -> None:
+        bits = self.bits
+        added = False
+
+        for p in self.positions(item):
+            byte = p >> 3
+            mask = 1 << (p & 7)
+
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                added = True
+
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: T) -> bool:
+        bits = self.bits
+
+        for p in self.positions(item):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def __repr__(self):
+        return format_repr(self, ["capacity", "error_rate", "size", "hashes"])
+
+
+class RecentSet(Generic[T]):
+    def __init__(self, maxlen: Optional[int] = None, ttl: Optional[float] = None):
+        if maxlen is None and ttl is None:
+            raise TypeError("either maxlen or ttl should be given")
+
+        if maxlen is not None and maxlen < 1:
+            raise TypeError("maxlen should be >= 1")
+
+        if ttl is not None and ttl <= 0:
+            raise TypeError("ttl should be > 0")
+
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.items = OrderedDict()
+
+    def expire(self) -> None:
+        if self.ttl is None:
+            return
+
+        items = self.items
+        deadline = monotonic() - self.ttl
+
+        while items:
+            item, seen_at = next(iter(items.items()))
+
+            if seen_at > deadline:
+                break
+
+            items.popitem(last=False)
+
+    def add(self, item: T) -> None:
+        items = self.items
+
+        items[item] = monotonic()
+        items.move_to_end(item)
+
+        if self.maxlen is not None and len(items) > self.maxlen:
+            items.popitem(last=False)
+
+    # NOTE: lookups refresh the item, so eviction is least-recently-used
+    def __contains__(self, item: T) -> bool:
+        self.expire()
+
+        if item not in self.items:
+            return False
+
+        self.add(item)
+
+        return True
+
+    def __len__(self) -> int:
+        self.expire()
+        return len(self.items)
+
+    def __repr__(self):
+        return format_repr(self, ["maxlen", "ttl"])
+
+
+DIGEST_LENGTH_BYTES = 8
+
+
+def encode_digest_part(tag: bytes, payload: bytes) -> bytes:
+    # NOTE: length prefix so that tuple elements cannot be confused
+    return tag + len(payload).to_bytes(DIGEST_LENGTH_BYTES, "little") + payload
+
+
+# NOTE: only types whose equality is faithfully captured by their bytes are
+# accepted, so that the set follows python's equality rules (e.g. True == 1).
+# Tagging types so that, say, "a" and b"a" get different digests.
+def digest_bytes(item: Any) -> bytes:
+    if isinstance(item, str):
+        return encode_digest_part(b"s", item.encode("utf-8", "surrogatepass"))
+
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return encode_digest_part(b"b", bytes(item))
+
+    if isinstance(item, int):
+        return encode_digest_part(b"i", b"%i" % item)
+
+    if isinstance(item, tuple):
+        return encode_digest_part(b"t", b"".join(digest_bytes(i) for i in item))
+
+    raise TypeError(
+        "DigestSet can only hash str, bytes, int or tuples of those, got %s "
+        "(use a key returning bytes or str instead)" % type(item).__name__
+    )
+
+
+class DigestSet(object):
+    def __init__(
+        self,
+        bits: int = 64,
+        capacity: int = 1024,
+        key: Optional[Callable[[Any], Union[str, bytes]]] = None,
+    ):
+        if bits != 64 and bits != 128:
+            raise TypeError("bits should be 64 or 128")
+
+        if capacity < 1:
+            raise TypeError("capacity should be >= 1")
+
+        self.bits = bits
+        self.width = bits // 64
+        self.key = key
+        self.count = 0
+
+        size = 8
+
+        while size < capacity * 2:
+            size *= 2
+
+        self.allocate(size)
+
+    def allocate(self, size: int) -> None:
+        self.size = size
+        self.mask = size - 1
+        self.table = array("Q", bytes(8 * self.width * size))
+
+    def digest(self, item: Any) -> Tuple[int, int]:
+        if self.key is not None:
+            k = self.key(item)
+
+            if isinstance(k, str):
+                data = k.encode("utf-8", "surrogatepass")
+            elif isinstance(k, (bytes, bytearray, memoryview)):
+                data = bytes(k)
+            else:
+                raise TypeError(
+                    "DigestSet key should return bytes or str, got %s"
+                    % type(k).__name__
+                )
+        else:
+            data = digest_bytes(item)
+
+        d = blake2b(data, digest_size=8 * self.width).digest()
+
+        high = int.from_bytes(d[:8], "little")
+        low = int.from_bytes(d[8:], "little") if self.width == 2 else 0
+
+        # NOTE: 0 marks empty slots
+        if not high and not low:
+            high = 1
+
+        return high, low
+
+    def find(self, high: int, low: int) -> Tuple[bool, int]:
+        table = self.table
+        mask = self.mask
+        i = high & mask
+
+        # Linear probing
+        if self.width == 1:
+            while True:
+                stored = table[i]
+
+                if stored == high:
+                    return True, i
+
+                if not stored:
+                    return False, i
+
+                i = (i + 1) & mask
+
+        while True:
+            j = i << 1
+            stored_high = table[j]
+            stored_low = table[j + 1]
+
+            if stored_high == high and stored_low == low:
+                return True, i
+
+            if not stored_high and not stored_low:
+                return False, i
+
+            i = (i + 1) & mask
+
+    def insert(self, high: int, low: int) -> None:
+        found, i = self.find(high, low)
+
+        if found:
+            return
+
+        if self.width == 1:
+            self.table[i] = high
+        else:
+            self.table[i << 1] = high
+            self.table[(i << 1) + 1] = low
+
+        self.count += 1
+
+        # Keeping load factor under 0.5
+        if self.count * 2 > self.size:
+            self.grow()
+
+    def grow(self) -> None:
+        table = self.table
+        width = self.width
+
+        self.allocate(self.size * 2)
+        self.count = 0
+
+        for j in range(0, len(table), width):
+            high = table[j]
+            low = table[j + 1] if width == 2 else 0
+
+            if high or low:
+                self.insert(high, low)
+
+    def add(self, item: Any) -> None:
+        self.insert(*self.digest(item))
+
+    def __contains__(self, item: Any) -> bool:
+        return self.find(*self.digest(item))[0]
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.table) * self.table.itemsize
+
+    def __repr__(self):
+        return format_repr(self, ["bits", "size", "count", "nbytes"])
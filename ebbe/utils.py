@@ -19,12 +19,25 @@ from typing import (
     Any,
     Callable,
     Type,
+    IO,
+    Iterator,
     overload,
 )
 from ebbe.types import Protocol
 
+import pickle
 from sys import version_info
-from collections import OrderedDict
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from functools import partial
+from heapq import merge
+from itertools import groupby
+from operator import itemgetter
+from random import Random
+from tempfile import TemporaryFile
+
+from ebbe.iter import as_chunks, uniq, default_max_in_flight, MERSENNE_PRIME_61
 
 AT_LEAST_PY37 = version_info >= (3, 7)
 DEFAULT_ORDERED_DICT = dict if AT_LEAST_PY37 else OrderedDict
@@ -40,6 +53,7 @@ KeyOrIndex = Union[str, int]
 Path = Union[KeyOrIndex, Iterable[KeyOrIndex]]
 
 Gettable = Union[Mapping[K, V], Sequence[V]]
+Column = Union[List[Any], "array[Any]", Any]
 
 
 @overload
@@ -71,6 +85,44 @@ def get(
         return default
 
 
+def as_column(
+    values: List[Any], *, typecode: Optional[str] = None, numpy: bool = False
+) -> Column:
+    if numpy:
+        import numpy as np
+
+        return np.array(values, dtype=typecode)
+
+    if typecode is not None:
+        return array(typecode, values)
+
+    return values
+
+
+def with_batch(
+    operation: Callable[..., Any], width: Optional[int] = None
+) -> Callable[..., Any]:
+    def batch(targets, default=NOT_FOUND, *, typecode=None, numpy=False):
+        if default is NOT_FOUND:
+            values = [operation(target) for target in targets]
+        else:
+            values = [operation(target, default) for target in targets]
+
+        if width is None:
+            return as_column(values, typecode=typecode, numpy=numpy)
+
+        columns = zip(*values) if values else [()] * width
+
+        return tuple(
+            as_column(list(column), typecode=typecode, numpy=numpy)
+            for column in columns
+        )
+
+    operation.batch = batch  # type: ignore
+
+    return operation
+
+
 class Getter(Protocol[K, GD]):
     @overload
     def __call__(self, target: Mapping[K, V], default: None = ...) -> Union[V, GD]:
@@ -93,6 +145,16 @@ class Getter(Protocol[K, GD]):
     ) -> Union[V, D, GD]:
         ...
 
+    def batch(
+        self,
+        targets: Iterable[Gettable[K, Any]],
+        default: Optional[Any] = ...,
+        *,
+        typecode: Optional[str] = ...,
+        numpy: bool = ...
+    ) -> Column:
+        ...
+
 
 @overload
 def getter(key: K, default: None = ...) -> Getter[K, None]:
@@ -111,6 +173,20 @@ def getter(key: K, default: Optional[GD] = None) -> Getter[K, GD]:
         except (KeyError, IndexError):
             return default
 
+    def batch(targets, default=default, *, typecode=None, numpy=False):
+        if not isinstance(targets, Sequence):
+            targets = list(targets)
+
+        # Optimistic pass first, so we don't pay for exception handling per item
+        try:
+            values = [target[key] for target in targets]
+        except (KeyError, IndexError):
+            values = [operation(target, default) for target in targets]
+
+        return as_column(values, typecode=typecode, numpy=numpy)
+
+    operation.batch = batch  # type: ignore
+
     return operation
 
 
@@ -166,10 +242,184 @@ def getpath(
     return target
 
 
+def prepare_path(
+    path: Path, *, split_char: Optional[str] = None, parse_indices: bool = False
+) -> Tuple[KeyOrIndex, ...]:
+    if split_char is not None:
+        if isinstance(path, str):
+            path = parse_path(path, split_char=split_char, parse_indices=parse_indices)
+    elif isinstance(path, str) or not isinstance(path, Iterable):
+        raise TypeError
+
+    return tuple(path)  # type: ignore
+
+
+PATH_ITEM_ERRORS = (IndexError, KeyError, TypeError)
+
+
+# NOTE: compiles a batch function for item-only paths, given a depth-first
+# program of (step, parent_slot, end) instructions, as built by `compile_paths`,
+# and the slots to output. The steps are inlined in a single loop over the
+# targets so that we don't pay for a function call per record, and chains of
+# steps that are not output nor shared are merged into a single expression
+# guarded by a single try.
+def compile_items_batch(
+    program: List[Tuple[KeyOrIndex, int, int]],
+    outputs: List[int],
+    optimistic: bool = False,
+) -> Callable[[Iterable[Any], Any], List[List[Any]]]:
+    n = len(program)
+    children = [0] * (n + 1)
+
+    for _, parent, _ in program:
+        children[parent] += 1
+
+    output_slots = set(outputs)
+    namespace = {"MISSING": NOT_FOUND, "ERRORS": PATH_ITEM_ERRORS}
+
+    # slot -> (materialized slot it derives from, inlined steps from there)
+    sources = {0: (0, "")}
+    materialized = {0}
+
+    lines = ["def run(targets, default):"]
+
+    # Optimistic pass first for single paths, so we don't pay for exception
+    # handling per item. Callers must give a sequence so we can retry.
+    if optimistic:
+        expression = "".join("[s%i]" % (i + 1) for i in range(n))
+        lines.append("    try:")
+        lines.append("        return [[v0%s for v0 in targets]]" % expression)
+        lines.append("    except ERRORS:")
+        lines.append("        pass")
+
+    for j in range(len(outputs)):
+        lines.append("    c%i = []" % j)
+        lines.append("    a%i = c%i.append" % (j, j))
+
+    lines.append("    for v0 in targets:")
+
+    for i, (step, parent, _) in enumerate(program):
+        slot = i + 1
+        namespace["s%i" % slot] = step
+
+        if parent in materialized:
+            base, suffix = parent, "[s%i]" % slot
+        else:
+            base, suffix = sources[parent]
+            suffix += "[s%i]" % slot
+
+        if slot not in output_slots and children[slot] == 1:
+            sources[slot] = (base, suffix)
+            continue
+
+        materialized.add(slot)
+        indent = "        "
+
+        if base != 0:
+            lines.append("        v%i = MISSING" % slot)
+            lines.append("        if v%i is not MISSING:" % base)
+            indent += "    "
+
+        lines.append(indent + "try:")
+        lines.append(indent + "    v%i = v%i%s" % (slot, base, suffix))
+        lines.append(indent + "except ERRORS:")
+        lines.append(indent + "    v%i = MISSING" % slot)
+
+    for j, slot in enumerate(outputs):
+        if slot == 0:
+            lines.append("        a%i(v0)" % j)
+        else:
+            lines.append(
+                "        a%i(default if v%i is MISSING else v%i)" % (j, slot, slot)
+            )
+
+    lines.append("    return [%s]" % ", ".join("c%i" % j for j in range(len(outputs))))
+
+    exec(compile("\n".join(lines) + "\n", "<ebbe.batch>", "exec"), namespace)
+
+    return namespace["run"]
+
+
 class PathGetter(Protocol):
     def __call__(self, target: Any, default: Optional[Any] = ...) -> Any:
         ...
 
+    def batch(
+        self,
+        targets: Iterable[Any],
+        default: Optional[Any] = ...,
+        *,
+        typecode: Optional[str] = ...,
+        numpy: bool = ...
+    ) -> Column:
+        ...
+
+
+def compile_path(
+    path: Iterable[KeyOrIndex],
+    *,
+    items: bool = True,
+    attributes: bool = False,
+    default: Optional[Any] = None
+) -> PathGetter:
+    steps = tuple(path)
+
+    # NOTE: the specialized paths below must remain consistent with `getpath`
+    if items and not attributes:
+        if len(steps) == 1:
+            step = steps[0]
+
+            def operation(target, default=default):
+                try:
+                    return target[step]
+                except (IndexError, KeyError, TypeError):
+                    return default
+
+        else:
+
+            def operation(target, default=default):
+                try:
+                    for step in steps:
+                        target = target[step]
+                except (IndexError, KeyError, TypeError):
+                    return default
+
+                return target
+
+        run = compile_items_batch(
+            [(step, i, i + 1) for i, step in enumerate(steps)],
+            [len(steps)],
+            optimistic=True,
+        )
+
+        def batch(targets, default=default, *, typecode=None, numpy=False):
+            if not isinstance(targets, Sequence):
+                targets = list(targets)
+
+            return as_column(run(targets, default)[0], typecode=typecode, numpy=numpy)
+
+        operation.batch = batch  # type: ignore
+
+        return operation
+
+    if attributes and not items:
+
+        def operation(target, default=default):
+            try:
+                for step in steps:
+                    target = getattr(target, step)
+            except (AttributeError, TypeError):
+                return default
+
+            return target
+
+        return with_batch(operation)
+
+    def operation(target, default=default):
+        return getpath(target, steps, default, items=items, attributes=attributes)
+
+    return with_batch(operation)
+
 
 def pathgetter(
     path: Path,
@@ -179,43 +429,163 @@ def pathgetter(
     parse_indices: bool = False,
     default: Optional[Any] = None,
 ) -> PathGetter:
-    # Preparsing paths
-    if split_char is not None:
-        path = parse_path(path, split_char=split_char, parse_indices=parse_indices)
+    path = prepare_path(path, split_char=split_char, parse_indices=parse_indices)
 
-    def operation(target, default=default):
-        return getpath(target, path, default, items=items, attributes=attributes)
-
-    return operation
+    return compile_path(path, items=items, attributes=attributes, default=default)
 
 
 class PathsGetter(Protocol):
     def __call__(self, target: Any, default: Optional[Any] = ...) -> Tuple[Any]:
         ...
 
+    def batch(
+        self,
+        targets: Iterable[Any],
+        default: Optional[Any] = ...,
+        *,
+        typecode: Optional[str] = ...,
+        numpy: bool = ...
+    ) -> Tuple[Column, ...]:
+        ...
 
-def pathsgetter(
-    *paths: Path,
+
+def compile_paths(
+    paths: Iterable[Iterable[KeyOrIndex]],
+    *,
     items: bool = True,
     attributes: bool = False,
-    split_char: Optional[str] = None,
-    parse_indices: bool = False,
     default: Optional[Any] = None
 ) -> PathsGetter:
-    # Preparsing paths
-    if split_char is not None:
-        paths = [
-            list(parse_path(p, split_char=split_char, parse_indices=parse_indices))
-            for p in paths
-        ]  # type: ignore
+    # Merging paths into a prefix tree so that shared steps are resolved once
+    tree = {}
+    leaves = []
+
+    for path in paths:
+        children = tree
+        node = None
+
+        for step in path:
+            try:
+                k = (type(step), step)
+                node = children.get(k)
+            except TypeError:
+                k = (type(step), id(step))
+                node = children.get(k)
+
+            if node is None:
+                node = (step, {})
+                children[k] = node
+
+            children = node[1]
+
+        leaves.append(node)
+
+    # Flattening the tree into a depth-first program where each instruction
+    # knows where its subtree ends, so that we can skip it altogether when
+    # a step cannot be resolved. Slot 0 is reserved for the target itself.
+    program = []
+    slots = {}
+
+    def flatten(children, parent_slot):
+        for node in children.values():
+            index = len(program)
+            program.append(None)
+            slots[id(node)] = index + 1
+            flatten(node[1], index + 1)
+            program[index] = (node[0], parent_slot, len(program))
+
+    flatten(tree, 0)
+
+    outputs = [0 if node is None else slots[id(node)] for node in leaves]
+    n = len(program)
+
+    if items and not attributes:
+
+        def operation(target, default=default):
+            values = [NOT_FOUND] * (n + 1)
+            values[0] = target
+
+            i = 0
+
+            while i < n:
+                step, parent, end = program[i]
+
+                try:
+                    values[i + 1] = values[parent][step]
+                except (IndexError, KeyError, TypeError):
+                    i = end
+                    continue
+
+                i += 1
+
+            return tuple(
+                [default if values[s] is NOT_FOUND else values[s] for s in outputs]
+            )
+
+        run = compile_items_batch(program, outputs)
+
+        def batch(targets, default=default, *, typecode=None, numpy=False):
+            return tuple(
+                as_column(column, typecode=typecode, numpy=numpy)
+                for column in run(targets, default)
+            )
+
+        operation.batch = batch  # type: ignore
+
+        return operation
 
     def operation(target, default=default):
+        values = [NOT_FOUND] * (n + 1)
+        values[0] = target
+
+        i = 0
+
+        while i < n:
+            step, parent, end = program[i]
+            t = values[parent]
+
+            if items and callable(getattr(t, "__getitem__", None)):
+                try:
+                    values[i + 1] = t[step]
+                except (IndexError, KeyError, TypeError):
+                    i = end
+                    continue
+            elif attributes:
+                try:
+                    values[i + 1] = getattr(t, step)
+                except (AttributeError, TypeError):
+                    i = end
+                    continue
+            else:
+                i = end
+                continue
+
+            i += 1
+
         return tuple(
-            getpath(target, path, default, items=items, attributes=attributes)
-            for path in paths
+            [default if values[s] is NOT_FOUND else values[s] for s in outputs]
         )
 
-    return operation
+    return with_batch(operation, width=len(outputs))
+
+
+def pathsgetter(
+    *paths: Path,
+    items: bool = True,
+    attributes: bool = False,
+    split_char: Optional[str] = None,
+    parse_indices: bool = False,
+    default: Optional[Any] = None
+) -> PathsGetter:
+    return compile_paths(
+        [
+            prepare_path(p, split_char=split_char, parse_indices=parse_indices)
+            for p in paths
+        ],
+        items=items,
+        attributes=attributes,
+        default=default,
+    )
 
 
 def sorted_uniq(
@@ -248,6 +618,73 @@ def sorted_uniq(
     return output
 
 
+def external_sorted_uniq_generator(
+    iterable, key, reverse, buffer_size, directory
+) -> Iterator[Any]:
+    runs = []
+    last_run = []
+
+    try:
+        for chunk in as_chunks(buffer_size, iterable):
+            if last_run:
+                runs.append(spill(last_run, directory))
+
+            chunk.sort(key=key, reverse=reverse)
+            last_run = list(uniq(chunk, key=key))
+
+        merged = merge(*(unspill(f) for f in runs), last_run, key=key, reverse=reverse)
+
+        yield from uniq(merged, key=key)
+
+    finally:
+        for f in runs:
+            f.close()
+
+
+def external_sorted_uniq(
+    iterable: Iterable[T],
+    *,
+    key: Optional[Callable[[T], Any]] = None,
+    reverse: bool = False,
+    presorted: bool = False,
+    buffer_size: int = 1000000,
+    directory: Optional[str] = None
+) -> Iterator[T]:
+    if not isinstance(iterable, Iterable):
+        raise TypeError("target is not iterable")
+
+    if key is not None and not callable(key):
+        raise TypeError("key is not callable")
+
+    if buffer_size < 1:
+        raise TypeError("buffer_size should be >= 1")
+
+    if presorted:
+        return uniq(iterable, key=key)
+
+    return external_sorted_uniq_generator(
+        iterable, key, reverse, buffer_size, directory
+    )
+
+
+def minhash(hashes: Iterable[int], size: int = 128, *, seed: int = 0) -> List[int]:
+    if size < 1:
+        raise TypeError("size should be >= 1")
+
+    rng = Random(seed)
+    p = MERSENNE_PRIME_61
+
+    permutations = [(rng.randrange(1, p), rng.randrange(0, p)) for _ in range(size)]
+    signature = [p] * size
+
+    for h in hashes:
+        signature = list(
+            map(min, signature, [(a * h + b) % p for a, b in permutations])
+        )
+
+    return signature
+
+
 @overload
 def indexed(iterable: Iterable[V], *, key: None = ...) -> Dict[V, V]:
     ...
@@ -303,6 +740,38 @@ def indexed(
     return index
 
 
+Reducer = Callable[[Any, Any], Any]
+
+REDUCERS = {
+    "count": (lambda acc, v: acc + 1, 0),
+    "sum": (lambda acc, v: acc + v, NOT_FOUND),
+    "min": (min, NOT_FOUND),
+    "max": (max, NOT_FOUND),
+    "first": (lambda acc, v: acc, NOT_FOUND),
+    "last": (lambda acc, v: v, NOT_FOUND),
+}
+
+
+def resolve_reducer(
+    reducer: Union[str, Reducer], initializer: Any = NOT_FOUND
+) -> Tuple[Reducer, Any]:
+    if isinstance(reducer, str):
+        if reducer not in REDUCERS:
+            raise TypeError('unknown reducer "%s"' % reducer)
+
+        fn, default_initializer = REDUCERS[reducer]
+
+        if initializer is NOT_FOUND:
+            initializer = default_initializer
+
+        return fn, initializer
+
+    if not callable(reducer):
+        raise TypeError("reducer is not callable")
+
+    return reducer, initializer
+
+
 @overload
 def grouped(iterable: Iterable[T]) -> Dict[T, List[T]]:
     ...
@@ -366,13 +835,29 @@ def grouped(
     ...
 
 
+@overload
+def grouped(
+    iterable: Iterable[T],
+    factory: Type[Dict] = ...,
+    container: Type = ...,
+    *,
+    key: Optional[Callable[[T], K]] = ...,
+    value: Optional[Callable[[T], Any]] = ...,
+    reducer: Union[str, Reducer],
+    initializer: Any = ...
+) -> Dict[Any, Any]:
+    ...
+
+
 def grouped(
     iterable: Iterable[T],
     factory: Type = dict,
     container: Type = list,
     *,
     key: Optional[Callable[[T], Any]] = None,
-    value: Optional[Callable[[T], Any]] = None
+    value: Optional[Callable[[T], Any]] = None,
+    reducer: Optional[Union[str, Reducer]] = None,
+    initializer: Any = NOT_FOUND
 ) -> MutableMapping:
     if not isinstance(iterable, Iterable):
         raise TypeError("target is not iterable")
@@ -391,6 +876,22 @@ def grouped(
 
     groups = factory()
 
+    # Folding values into a single accumulator per key
+    if reducer is not None:
+        reducer, initializer = resolve_reducer(reducer, initializer)
+
+        for item in iterable:
+            k = key(item) if key is not None else item
+            v = item if value is None else value(item)
+            acc = groups.get(k, NOT_FOUND)
+
+            if acc is NOT_FOUND:
+                groups[k] = v if initializer is NOT_FOUND else reducer(initializer, v)
+            else:
+                groups[k] = reducer(acc, v)
+
+        return groups
+
     if hasattr(container, "add") and callable(container.add):
         adder = container.add
     elif hasattr(container, "append") and callable(container.append):
@@ -418,13 +919,125 @@ def partitioned(
     container: Type = list,
     *,
     key: Optional[Callable[[T], Any]] = None,
-    value: Optional[Callable[[T], V]] = None
+    value: Optional[Callable[[T], V]] = None,
+    reducer: Optional[Union[str, Reducer]] = None,
+    initializer: Any = NOT_FOUND
+) -> Union[List[Collection[T]], List[Collection[V]], List[Any]]:
+    groups = grouped(
+        iterable,
+        factory,
+        container,
+        key=key,
+        value=value,
+        reducer=reducer,
+        initializer=initializer,
+    )
+    return list(groups.values())  # type: ignore
+
+
+def parallel_grouped(
+    iterable: Iterable[T],
+    factory: Type = dict,
+    container: Type = list,
+    *,
+    key: Optional[Callable[[T], Any]] = None,
+    value: Optional[Callable[[T], Any]] = None,
+    executor: Executor,
+    chunk_size: int = 10000,
+    max_in_flight: Optional[int] = None
+) -> MutableMapping:
+    if not isinstance(iterable, Iterable):
+        raise TypeError("target is not iterable")
+
+    if not callable(factory):
+        raise TypeError("factory is not callable")
+
+    if not callable(container):
+        raise TypeError("container is not callable")
+
+    if key is not None and not callable(key):
+        raise TypeError("key is not callable")
+
+    if value is not None and not callable(value):
+        raise TypeError("value is not callable")
+
+    if not isinstance(executor, Executor):
+        raise TypeError("executor should be a concurrent.futures Executor")
+
+    if chunk_size < 1:
+        raise TypeError("chunk_size should be >= 1")
+
+    # Bounding the number of chunks in flight to keep memory in check
+    if max_in_flight is None:
+        max_in_flight = 2 * default_max_in_flight()
+
+    if max_in_flight < 1:
+        raise TypeError("max_in_flight should be >= 1")
+
+    # NOTE: lists are concatenated in chunk order, sets are unioned
+    if hasattr(container, "update") and callable(container.update):
+        merger = container.update
+    elif hasattr(container, "extend") and callable(container.extend):
+        merger = container.extend
+    else:
+        raise TypeError("unknown container")
+
+    # NOTE: `grouped` is a module-level function so that process pools
+    # can pickle it. `key` and `value` must then be picklable too.
+    work = partial(grouped, container=container, key=key, value=value)
+
+    groups = factory()
+
+    def merge_partial(partial_groups):
+        for k, c in partial_groups.items():
+            g = groups.get(k)
+
+            if g is None:
+                groups[k] = c
+            else:
+                merger(g, c)
+
+    in_flight = deque()
+
+    for chunk in as_chunks(chunk_size, iterable):
+        if len(in_flight) >= max_in_flight:
+            merge_partial(in_flight.popleft().result())
+
+        in_flight.append(executor.submit(work, chunk))
+
+    while in_flight:
+        merge_partial(in_flight.popleft().result())
+
+    return groups
+
+
+def parallel_partitioned(
+    iterable: Iterable[T],
+    factory: Type = DEFAULT_ORDERED_DICT,
+    container: Type = list,
+    *,
+    key: Optional[Callable[[T], Any]] = None,
+    value: Optional[Callable[[T], V]] = None,
+    executor: Executor,
+    chunk_size: int = 10000,
+    max_in_flight: Optional[int] = None
 ) -> Union[List[Collection[T]], List[Collection[V]]]:
-    groups = grouped(iterable, factory, container, key=key, value=value)
+    groups = parallel_grouped(
+        iterable,
+        factory,
+        container,
+        key=key,
+        value=value,
+        executor=executor,
+        chunk_size=chunk_size,
+        max_in_flight=max_in_flight,
+    )
     return list(groups.values())  # type: ignore
 
 
-def grouped_items(iterable, factory=dict, container=list):
+def grouped_items(
+    iterable, factory=dict, container=list, *, reducer=None, initializer=NOT_FOUND
+):
     if not isinstance(iterable, Iterable):
         raise TypeError("target is not iterable")
 
@@ -436,6 +1049,19 @@ def grouped_items(iterable, factory=dict, container=list):
 
     groups = factory()
 
+    if reducer is not None:
+        reducer, initializer = resolve_reducer(reducer, initializer)
+
+        for k, v in iterable:
+            acc = groups.get(k, NOT_FOUND)
+
+            if acc is NOT_FOUND:
+                groups[k] = v if initializer is NOT_FOUND else reducer(initializer, v)
+            else:
+                groups[k] = reducer(acc, v)
+
+        return groups
+
     if hasattr(container, "add") and callable(container.add):
         adder = container.add
     elif hasattr(container, "append") and callable(container.append):
@@ -455,11 +1081,163 @@ def grouped_items(iterable, factory=dict, container=list):
     return groups
 
 
-def partitioned_items(iterable, factory=DEFAULT_ORDERED_DICT, container=list):
-    groups = grouped_items(iterable, factory, container)
+def partitioned_items(
+    iterable,
+    factory=DEFAULT_ORDERED_DICT,
+    container=list,
+    *,
+    reducer=None,
+    initializer=NOT_FOUND
+):
+    groups = grouped_items(
+        iterable, factory, container, reducer=reducer, initializer=initializer
+    )
     return list(groups.values())
 
 
+def spill(items: Iterable[Any], directory: Optional[str] = None) -> IO[bytes]:
+    f = TemporaryFile(dir=directory)
+
+    # NOTE: dumping items one by one so that the pickler memo does not grow
+    for item in items:
+        pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    f.seek(0)
+
+    return f
+
+
+def unspill(f: IO[bytes]) -> Iterator[Any]:
+    while True:
+        try:
+            yield pickle.load(f)
+        except EOFError:
+            return
+
+
+def external_grouped_generator(
+    pairs, container, max_items, max_groups, directory
+) -> Iterator[Tuple[Any, Any]]:
+    if hasattr(container, "add") and callable(container.add):
+        adder = container.add
+        merger = container.update
+    else:
+        adder = container.append
+        merger = container.extend
+
+    first = itemgetter(0)
+    runs = []
+
+    try:
+        groups = {}
+        held = 0
+
+        for k, v in pairs:
+            c = groups.get(k)
+
+            if c is None:
+                c = container()
+                groups[k] = c
+
+            adder(c, v)
+            held += 1
+
+            if held >= max_items or (
+                max_groups is not None and len(groups) >= max_groups
+            ):
+                runs.append(spill(sorted(groups.items(), key=first), directory))
+                groups = {}
+                held = 0
+
+        # Last run stays in memory
+        last_run = sorted(groups.items(), key=first)
+        del groups
+
+        merged = merge(*(unspill(f) for f in runs), last_run, key=first)
+
+        for k, partial_groups in groupby(merged, key=first):
+            c = None
+
+            for _, partial_group in partial_groups:
+                if c is None:
+                    c = partial_group
+                else:
+                    merger(c, partial_group)
+
+            yield k, c
+
+    finally:
+        for f in runs:
+            f.close()
+
+
+def check_external_grouped_arguments(
+    iterable, container, max_items, max_groups
+) -> None:
+    if not isinstance(iterable, Iterable):
+        raise TypeError("target is not iterable")
+
+    if not callable(container):
+        raise TypeError("container is not callable")
+
+    if not (hasattr(container, "add") and hasattr(container, "update")) and not (
+        hasattr(container, "append") and hasattr(container, "extend")
+    ):
+        raise TypeError("unknown container")
+
+    if max_items < 1:
+        raise TypeError("max_items should be >= 1")
+
+    if max_groups is not None and max_groups < 1:
+        raise TypeError("max_groups should be >= 1")
+
+
+def external_grouped(
+    iterable: Iterable[T],
+    container: Type = list,
+    *,
+    key: Optional[Callable[[T], Any]] = None,
+    value: Optional[Callable[[T], Any]] = None,
+    max_items: int = 1000000,
+    max_groups: Optional[int] = None,
+    directory: Optional[str] = None
+) -> Iterator[Tuple[Any, Collection[Any]]]:
+    check_external_grouped_arguments(iterable, container, max_items, max_groups)
+
+    if key is not None and not callable(key):
+        raise TypeError("key is not callable")
+
+    if value is not None and not callable(value):
+        raise TypeError("value is not callable")
+
+    pairs = (
+        (
+            key(item) if key is not None else item,
+            item if value is None else value(item),
+        )
+        for item in iterable
+    )
+
+    return external_grouped_generator(
+        pairs, container, max_items, max_groups, directory
+    )
+
+
+def external_grouped_items(
+    iterable: Iterable[Tuple[K, V]],
+    container: Type = list,
+    *,
+    max_items: int = 1000000,
+    max_groups: Optional[int] = None,
+    directory: Optional[str] = None
+) -> Iterator[Tuple[K, Collection[V]]]:
+    check_external_grouped_arguments(iterable, container, max_items, max_groups)
+
+    return external_grouped_generator(
+        iterable, container, max_items, max_groups, directory
+    )
+
+
 def pick(d: Dict[K, V], keys: Iterable[K], *, strict: bool = False) -> Dict[K, V]:
     n = {}
 
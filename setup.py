@@ -14,7 +14,7 @@ setup(
     author="Guillaume Plique",
     author_email="kropotkinepiotr@gmail.com",
     keywords="iter",
-    python_requires=">=3.5",
+    python_requires=">=3.8",
     packages=find_packages(exclude=["test"]),
     package_data={"docs": ["README.md"]},
     install_requires=[],
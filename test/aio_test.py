@@ -0,0 +1,97 @@
+# =============================================================================
+# Ebbe Asynchronous Iterating Functions Unit Tests
+# =============================================================================
+import pytest
+import asyncio
+
+from ebbe.aio import as_chunks, as_reconciled_chunks, outer_zip
+
+
+async def collect(aiterable):
+    return [item async for item in aiterable]
+
+
+async def agenerate(iterable):
+    for item in iterable:
+        await asyncio.sleep(0)
+        yield item
+
+
+class TestAio(object):
+    def test_as_chunks(self):
+        data = [1, 2, 3, 4, 5]
+
+        assert asyncio.run(collect(as_chunks(2, data))) == [[1, 2], [3, 4], [5]]
+        assert asyncio.run(collect(as_chunks(2, agenerate(data)))) == [
+            [1, 2],
+            [3, 4],
+            [5],
+        ]
+        assert asyncio.run(collect(as_chunks(2, []))) == []
+
+    def test_as_reconciled_chunks(self):
+        data = list(range(20))
+        running = 0
+        max_running = 0
+
+        async def work(chunk):
+            nonlocal running, max_running
+
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.001 * (chunk[0] % 3))
+            running -= 1
+
+            return {n: n * 2 for n in chunk}
+
+        def reconcile(data, item):
+            return data[item]
+
+        expected = [(n, n * 2) for n in data]
+
+        with pytest.raises(TypeError):
+            asyncio.run(
+                collect(as_reconciled_chunks(3, data, work, reconcile, max_in_flight=0))
+            )
+
+        for size in [1, 3, 20]:
+            for max_in_flight in [1, 2, 4]:
+                result = asyncio.run(
+                    collect(
+                        as_reconciled_chunks(
+                            size,
+                            agenerate(data),
+                            work,
+                            reconcile,
+                            max_in_flight=max_in_flight,
+                        )
+                    )
+                )
+
+                assert result == expected
+
+        assert 1 < max_running <= 4
+
+        sync_result = asyncio.run(
+            collect(
+                as_reconciled_chunks(
+                    3, data, lambda c: {n: -n for n in c}, reconcile, max_in_flight=2
+                )
+            )
+        )
+
+        assert sync_result == [(n, -n) for n in data]
+
+    def test_outer_zip(self):
+        data = [("one", 1), ("two", 2), ("three", 3)]
+
+        async def work(numbers):
+            async for chunk in as_chunks(2, numbers):
+                await asyncio.sleep(0)
+
+                for n in chunk:
+                    yield n * 2
+
+        result = asyncio.run(collect(outer_zip(data, key=lambda p: p[1], work=work)))
+
+        assert result == [(("one", 1), 2), (("two", 2), 4), (("three", 3), 6)]
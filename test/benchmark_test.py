@@ -0,0 +1,476 @@
+# =============================================================================
+# Ebbe Benchmark Unit Tests
+# =============================================================================
+import csv
+import json
+import pytest
+import gc
+import asyncio
+import weakref
+from threading import Thread
+from io import StringIO
+
+from ebbe.benchmark import (
+    Timer,
+    AccumulatingTimer,
+    Timers,
+    Profiler,
+    LatencyHistogram,
+    BenchmarkResult,
+    percentile,
+    run_benchmark,
+    compare_benchmarks,
+    write_benchmarks,
+    save_baseline,
+    load_baseline,
+    check_baseline,
+    BenchmarkRegressionWarning,
+    BenchmarkRegressionError,
+)
+
+
+class TestBenchmark(object):
+    def test_timer(self):
+        output = StringIO()
+
+        with Timer("test", file=output):
+            pass
+
+        assert output.getvalue().startswith("test: ")
+
+        output = StringIO()
+
+        with Timer("test", file=output, output="jsonl"):
+            pass
+
+        record = json.loads(output.getvalue())
+
+        assert record["name"] == "test"
+        assert isinstance(record["duration"], float)
+
+        output = StringIO()
+
+        with Timer("test", file=output, output="csv"):
+            pass
+
+        rows = list(csv.reader(StringIO(output.getvalue())))
+
+        assert len(rows) == 1
+        assert rows[0][0] == "test"
+        assert float(rows[0][1]) >= 0
+
+        with pytest.raises(TypeError):
+            Timer(output="xml")
+
+        with Timer(file=StringIO()) as t:
+            pass
+
+        assert isinstance(t, Timer)
+        assert t.duration >= 0
+
+    def test_accumulating_timer(self):
+        t = AccumulatingTimer("loop")
+
+        assert t.count == 0
+        assert t.mean == 0.0
+        assert str(t) == "loop: never called"
+        assert t.to_dict()["min"] is None
+
+        for _ in range(100):
+            with t as entered:
+                assert entered is t
+
+        assert t.count == 100
+        assert 0 <= t.min <= t.mean <= t.max
+        assert t.total >= t.max
+        assert isinstance(t.total, int)
+        assert str(t).startswith("loop: ")
+
+        record = t.to_dict()
+
+        assert record["name"] == "loop"
+        assert record["count"] == 100
+        assert record["duration"] == t.total / 1e9
+
+        t.reset()
+
+        assert t.count == 0
+        assert t.total == 0
+
+    def test_timers(self):
+        timers = Timers()
+
+        for _ in range(10):
+            with timers("fast"):
+                pass
+
+            with timers("slow"):
+                sum(range(1000))
+
+        assert len(timers) == 2
+        assert "fast" in timers
+        assert "missing" not in timers
+        assert timers("fast") is timers["fast"]
+        assert timers["fast"].count == 10
+        assert [t.name for t in timers] == ["fast", "slow"]
+
+        output = StringIO()
+        timers.print(file=output)
+
+        lines = output.getvalue().splitlines()
+
+        assert len(lines) == 2
+        assert lines[0].startswith("slow: ")
+        assert lines[0].endswith("%")
+
+        output = StringIO()
+        timers.print(file=output, output="jsonl")
+
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+
+        assert [r["count"] for r in records] == [10, 10]
+
+        timers.reset()
+
+        assert timers["slow"].count == 0
+
+    def test_percentile(self):
+        assert percentile([1], 99) == 1
+        assert percentile([1, 2, 3, 4, 5], 50) == 3
+        assert percentile([1, 2], 50) == 1.5
+        assert percentile([0, 10], 95) == pytest.approx(9.5)
+
+        with pytest.raises(TypeError):
+            percentile([], 50)
+
+    def test_benchmark_result(self):
+        result = BenchmarkResult("test", 10, [1.0, 2.0, 3.0, 4.0])
+
+        assert result.min == 1.0
+        assert result.max == 4.0
+        assert result.mean == 2.5
+        assert result.median == 2.5
+        assert result.stddev == pytest.approx(1.2909944)
+        assert result.ops_per_second == 0.4
+        assert result.format().startswith("test: mean 2s, 500ms ± 1s, 290ms | ")
+        assert result.format().endswith("| 0 ops/s | 4 × 10")
+
+    def test_benchmark(self):
+        calls = []
+
+        def work():
+            calls.append(None)
+
+        result = run_benchmark(work, rounds=3, iterations=5, warmup=2)
+
+        assert result.name == "work"
+        assert result.iterations == 5
+        assert len(result.timings) == 3
+        assert result.timings == sorted(result.timings)
+        assert len(calls) == 25
+
+        result = run_benchmark(work, name="auto", rounds=2, min_time=0.001)
+
+        assert result.name == "auto"
+        assert result.iterations >= 1
+
+        with pytest.raises(TypeError):
+            run_benchmark(work, rounds=0)
+
+        with pytest.raises(TypeError):
+            run_benchmark(work, iterations=0)
+
+    def test_compare_benchmarks(self):
+        output = StringIO()
+
+        results = compare_benchmarks(
+            lambda: sum(range(10)),
+            lambda: sum(range(1000)),
+            names=["small", "large"],
+            rounds=3,
+            min_time=0.001,
+            file=output,
+        )
+
+        assert [r.name for r in results] == ["small", "large"]
+        assert results[0].iterations == results[1].iterations
+
+        lines = output.getvalue().splitlines()
+
+        assert len(lines) == 2
+        assert lines[0].startswith("small: ")
+        assert lines[1].startswith("large: ")
+        assert "fastest" in output.getvalue()
+
+        with pytest.raises(TypeError):
+            compare_benchmarks(lambda: None)
+
+        with pytest.raises(TypeError):
+            compare_benchmarks(lambda: None, lambda: None, names=["one"])
+
+    def test_write_benchmarks(self):
+        results = [
+            BenchmarkResult("one", 10, [1.0, 2.0]),
+            BenchmarkResult("two", 10, [3.0, 4.0]),
+        ]
+
+        output = StringIO()
+        write_benchmarks(results, output)
+
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+
+        assert [r["name"] for r in records] == ["one", "two"]
+        assert records[0]["median"] == 1.5
+        assert records[1]["rounds"] == 2
+
+        output = StringIO()
+        write_benchmarks(results, output, output="csv")
+
+        rows = list(csv.DictReader(StringIO(output.getvalue())))
+
+        assert [r["name"] for r in rows] == ["one", "two"]
+        assert float(rows[1]["median"]) == 3.5
+
+        with pytest.raises(TypeError):
+            write_benchmarks(results, output, output="xml")
+
+    def test_write_benchmarks_mixed_csv(self):
+        timer = Timer("timer")
+        timer.duration = 1.5
+
+        accumulating = AccumulatingTimer("accumulating")
+
+        with accumulating:
+            pass
+
+        result = BenchmarkResult("result", 10, [1.0, 2.0])
+
+        output = StringIO()
+        write_benchmarks([timer, accumulating, result], output, output="csv")
+
+        lines = list(csv.reader(StringIO(output.getvalue())))
+
+        assert len(set(len(line) for line in lines)) == 1
+
+        rows = list(csv.DictReader(StringIO(output.getvalue())))
+
+        assert [r["name"] for r in rows] == ["timer", "accumulating", "result"]
+        assert float(rows[0]["duration"]) == 1.5
+        assert rows[0]["median"] == ""
+        assert rows[1]["count"] == "1"
+        assert rows[2]["duration"] == ""
+        assert float(rows[2]["median"]) == 1.5
+
+        output = StringIO()
+        write_benchmarks([], output, output="csv")
+
+        assert output.getvalue() == ""
+
+    def test_baseline(self, tmp_path):
+        path = str(tmp_path / "baseline.jsonl")
+
+        save_baseline(
+            [
+                BenchmarkResult("one", 10, [1.0, 2.0]),
+                BenchmarkResult("two", 10, [3.0, 4.0]),
+            ],
+            path,
+        )
+
+        baseline = load_baseline(path)
+
+        assert set(baseline) == {"one", "two"}
+        assert baseline["one"]["median"] == 1.5
+
+        results = [
+            BenchmarkResult("one", 10, [1.0, 2.1]),
+            BenchmarkResult("two", 10, [5.0, 6.0]),
+            BenchmarkResult("three", 10, [100.0]),
+        ]
+
+        with pytest.warns(BenchmarkRegressionWarning):
+            regressions = check_baseline(results, path)
+
+        assert len(regressions) == 1
+        assert regressions[0].name == "two"
+        assert regressions[0].metric == "median"
+        assert regressions[0].ratio == pytest.approx(5.5 / 3.5)
+
+        assert check_baseline(results, baseline, threshold=1.0) == []
+
+        with pytest.raises(BenchmarkRegressionError) as info:
+            check_baseline(results, baseline, metric="min", strict=True)
+
+        assert [r.name for r in info.value.regressions] == ["two"]
+
+        with pytest.raises(TypeError):
+            check_baseline(results, baseline, metric="ops_per_second")
+
+        timer = Timer("one")
+        timer.duration = 2.0
+
+        with pytest.warns(BenchmarkRegressionWarning):
+            check_baseline([timer], {"one": {"name": "one", "duration": 1.0}})
+
+    def test_profiler(self):
+        profiler = Profiler()
+
+        with profiler.span("etl") as etl:
+            with profiler.span("read"):
+                pass
+
+            with profiler.span("write;all"):
+                pass
+
+        assert [s.path for s in profiler.spans] == [
+            ("etl", "read"),
+            ("etl", "write;all"),
+            ("etl",),
+        ]
+        assert etl.parent is None
+        assert profiler.spans[0].parent is etl
+        assert etl.duration >= etl.children_time
+        assert etl.self_time == etl.duration - etl.children_time
+
+        stacks = profiler.collapsed(unit="nanoseconds")
+
+        assert set(stacks) == {"etl", "etl;read", "etl;write:all"}
+        assert stacks["etl"] == etl.self_time
+
+        output = StringIO()
+        profiler.write_collapsed(output)
+
+        assert len(output.getvalue().splitlines()) == 3
+
+        with pytest.raises(TypeError):
+            profiler.collapsed(unit="hours")
+
+        profiler.clear()
+
+        assert profiler.spans == []
+
+    def test_profiler_threads_and_tasks(self):
+        profiler = Profiler()
+
+        def work():
+            with profiler.span("thread"):
+                pass
+
+        with profiler.span("main"):
+            thread = Thread(target=work)
+            thread.start()
+            thread.join()
+
+        # NOTE: threads start with a fresh context
+        assert ("thread",) in [s.path for s in profiler.spans]
+
+        async def job(name):
+            with profiler.span(name):
+                await asyncio.sleep(0.001)
+
+        async def main():
+            with profiler.span("gather"):
+                await asyncio.gather(job("one"), job("two"))
+
+        asyncio.run(main())
+
+        paths = [s.path for s in profiler.spans]
+
+        assert any(s.task_name is not None for s in profiler.spans)
+
+        # NOTE: spans must not keep finished tasks alive
+        tasks = []
+
+        async def tracked():
+            task = asyncio.ensure_future(job("tracked"))
+            tasks.append(weakref.ref(task))
+            await task
+
+        asyncio.run(tracked())
+        gc.collect()
+
+        assert tasks[0]() is None
+
+        assert ("gather", "one") in paths
+        assert ("gather", "two") in paths
+
+        trace = json.loads(json.dumps(profiler.chrome_trace()))
+        events = trace["traceEvents"]
+
+        spans = [e for e in events if e["ph"] == "X"]
+        lanes = [e for e in events if e["ph"] == "M"]
+
+        assert len(spans) == len(profiler.spans)
+        assert all(e["dur"] >= 0 for e in spans)
+
+        tids = {e["name"]: e["tid"] for e in spans}
+
+        assert tids["main"] != tids["thread"]
+        assert tids["one"] != tids["two"]
+        assert len(lanes) == len(set(tids.values()))
+
+        output = StringIO()
+        profiler.write_chrome_trace(output)
+
+        assert json.loads(output.getvalue())["traceEvents"]
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram(precision=4, max_value=10_000)
+
+        previous = -1
+
+        for i in range(len(histogram.buckets)):
+            lo, hi = histogram.bucket_bounds(i)
+
+            assert lo == previous + 1
+            assert histogram.bucket_index(lo) == i
+            assert histogram.bucket_index(hi) == i
+
+            previous = hi
+
+        assert previous >= 10_000
+        assert histogram.nbytes == 8 * len(histogram.buckets)
+        assert str(histogram) == "no values"
+
+        with pytest.raises(TypeError):
+            histogram.percentile(50)
+
+        for v in range(1, 101):
+            histogram.record(v * 100)
+
+        histogram.record(1_000_000)
+
+        assert len(histogram) == 101
+        assert histogram.min == 100
+        assert histogram.max == 1_000_000
+        assert histogram.percentile(0) == 100
+        assert histogram.percentile(100) == 1_000_000
+
+        # NOTE: relative error is bounded by the precision
+        assert abs(histogram.percentile(50) - 5100) / 5100 <= 2 ** (1 - 4)
+        assert abs(histogram.percentile(90) - 9100) / 9100 <= 2 ** (1 - 4)
+
+        other = LatencyHistogram(precision=4, max_value=10_000)
+        other.record(50)
+        histogram.merge(other)
+
+        assert histogram.count == 102
+        assert histogram.min == 50
+        assert histogram.to_dict()["min"] == 50 / 1e9
+
+        with pytest.raises(TypeError):
+            histogram.merge(LatencyHistogram())
+
+        histogram.reset()
+
+        assert histogram.count == 0
+        assert sum(histogram.buckets) == 0
+
+        with pytest.raises(TypeError):
+            LatencyHistogram(precision=1)
+
+    def test_submodule_is_not_shadowed(self):
+        import ebbe
+        import ebbe.benchmark
+
+        assert ebbe.benchmark.Timer is Timer
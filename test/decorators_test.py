@@ -2,7 +2,9 @@
 # Ebbe Decorators Unit Tests
 # =============================================================================
 import pytest
-from ebbe.decorators import fail_fast, with_defer
+from threading import Thread
+from ebbe.benchmark import LatencyHistogram
+from ebbe.decorators import fail_fast, prefetch, with_defer, timed
 
 
 class TestDecorators(object):
@@ -15,6 +17,70 @@ class TestDecorators(object):
         with pytest.raises(RuntimeError):
             hellraiser()
 
+        @fail_fast(warmup=2)
+        def late_hellraiser():
+            yield 1
+            raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            late_hellraiser()
+
+    def test_fail_fast_hook(self):
+        reports = []
+
+        @fail_fast(hook=reports.append)
+        def numbers(n):
+            if n > 10:
+                raise TypeError
+
+            yield from range(n)
+
+        assert list(numbers(5)) == [0, 1, 2, 3, 4]
+        assert len(reports) == 1
+
+        stats = reports[0]
+
+        assert stats.name.endswith("numbers")
+        assert stats.items == 5
+        assert stats.time_to_first_item is not None
+        assert 0 <= stats.time_to_first_item <= stats.duration
+        assert 0 <= stats.production_time <= stats.duration
+        assert stats.throughput is None or stats.throughput > 0
+
+        with pytest.raises(TypeError):
+            numbers(15)
+
+        assert len(reports) == 2
+        assert reports[1].items == 0
+        assert reports[1].time_to_first_item is None
+        assert not reports[1].throughput
+
+        gen = numbers(5)
+        assert next(gen) == 0
+        gen.close()
+
+        assert len(reports) == 3
+        assert reports[2].items == 1
+
+    def test_prefetch(self):
+        @prefetch(2)
+        def numbers(n):
+            yield from range(n)
+
+        assert list(numbers(5)) == [0, 1, 2, 3, 4]
+
+        @prefetch()
+        def hellraiser():
+            yield 1
+            raise RuntimeError
+
+        gen = hellraiser()
+
+        assert next(gen) == 1
+
+        with pytest.raises(RuntimeError):
+            next(gen)
+
     def test_with_defer(self):
         values = []
 
@@ -28,3 +94,115 @@ class TestDecorators(object):
         operation(3, 6)
 
         assert values == [7, 10, 8, 10, 9, 10]
+
+    def test_timed(self):
+        @timed()
+        def double(x):
+            return x * 2
+
+        assert double(4) == 8
+        assert double.histogram.count == 1
+
+        histogram = LatencyHistogram()
+
+        @timed(histogram, sample=3)
+        def triple(x):
+            return x * 3
+
+        assert [triple(i) for i in range(9)] == [i * 3 for i in range(9)]
+        assert triple.histogram is histogram
+        assert histogram.count == 3
+
+        @timed(sample=2)
+        def hellraiser():
+            raise RuntimeError
+
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                hellraiser()
+
+        assert hellraiser.histogram.count == 1
+
+        with pytest.raises(TypeError):
+            timed(sample=0)
+
+    def test_timed_generator(self):
+        closed = []
+
+        @timed(sample=2)
+        def numbers(n):
+            try:
+                yield from range(n)
+            finally:
+                closed.append(n)
+
+        assert list(numbers(6)) == [0, 1, 2, 3, 4, 5]
+        assert numbers.histogram.count == 3
+        assert closed == [6]
+
+        gen = numbers(10)
+        assert next(gen) == 0
+        gen.close()
+
+        assert closed == [6, 10]
+
+    def test_timed_threads(self):
+        @timed()
+        def noop(x):
+            return x
+
+        def work():
+            for i in range(2000):
+                noop(i)
+
+        threads = [Thread(target=work) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert noop.histogram.count == 16000
+        assert sum(noop.histogram.buckets) == 16000
+
+    def test_timed_generator_send_and_throw(self):
+        @timed()
+        def accumulator():
+            total = 0
+
+            while True:
+                try:
+                    value = yield total
+                except ValueError:
+                    total = 0
+                    continue
+
+                if value is None:
+                    return total
+
+                total += value
+
+        gen = accumulator()
+
+        assert next(gen) == 0
+        assert gen.send(3) == 3
+        assert gen.send(4) == 7
+        assert gen.throw(ValueError) == 0
+        assert gen.send(5) == 5
+
+        with pytest.raises(StopIteration) as info:
+            gen.send(None)
+
+        assert info.value.value == 5
+
+        @timed()
+        def fragile():
+            yield 1
+            yield 2
+
+        gen = fragile()
+        next(gen)
+
+        with pytest.raises(KeyError):
+            gen.throw(KeyError)
@@ -1,15 +1,27 @@
 # =============================================================================
 # Ebbe Iterating Functions Unit Tests
 # =============================================================================
+import gc
 import pytest
+from time import sleep, perf_counter
+from threading import Lock
+from array import array
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.pool import ThreadPool
 from operator import itemgetter
 
+from ebbe.iter import AS_CHUNKS_MAX_BUFFER
 from ebbe import (
     as_chunks,
     as_reconciled_chunks,
     outer_zip,
     as_grams,
+    as_multi_grams,
+    as_strided_grams,
+    as_hashed_grams,
     fail_fast,
+    prefetch,
     uniq,
     distinct,
     with_prev,
@@ -19,6 +31,9 @@ from ebbe import (
     with_is_last,
     without_first,
     without_last,
+    Pipeline,
+    BloomFilter,
+    RecentSet,
 )
 
 STRING = "Bonjour"
@@ -68,6 +83,107 @@ class TestIter(object):
 
         assert result == []
 
+    def test_as_chunks_limits(self):
+        with pytest.raises(TypeError):
+            list(as_chunks(None, [1, 2]))
+
+        with pytest.raises(TypeError):
+            list(as_chunks(0, [1, 2]))
+
+        with pytest.raises(TypeError):
+            list(as_chunks(None, ["a", "bb"], weight=len))
+
+        words = ["a", "bb", "ccc", "d", "ee", "ffff", "g"]
+
+        assert list(as_chunks(None, words, max_weight=4)) == [
+            ["a", "bb"],
+            ["ccc", "d"],
+            ["ee"],
+            ["ffff"],
+            ["g"],
+        ]
+
+        assert list(as_chunks(2, words, max_weight=5)) == [
+            ["a", "bb"],
+            ["ccc", "d"],
+            ["ee"],
+            ["ffff", "g"],
+        ]
+
+        assert list(as_chunks(None, range(10), weight=lambda x: x, max_weight=10)) == [
+            [0, 1, 2, 3, 4],
+            [5],
+            [6],
+            [7],
+            [8],
+            [9],
+        ]
+
+        assert list(as_chunks(3, range(7), max_time=10)) == [
+            [0, 1, 2],
+            [3, 4, 5],
+            [6],
+        ]
+
+        def slow():
+            yield 1
+            yield 2
+            sleep(0.2)
+            yield 3
+
+        assert list(as_chunks(10, slow(), max_time=0.05)) == [[1, 2], [3]]
+        assert list(
+            as_chunks(None, slow(), max_weight=100, weight=int, max_time=1)
+        ) == [[1, 2, 3]]
+
+        def hellraiser():
+            yield 1
+            raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            list(as_chunks(10, hellraiser(), max_time=0.05))
+
+        produced = []
+
+        def producer():
+            for i in range(100_000):
+                produced.append(i)
+                yield i
+
+        # NOTE: the background reader must not outrun a slow consumer
+        chunks = as_chunks(None, producer(), max_time=10, max_weight=1, weight=int)
+        next(chunks)
+
+        sleep(0.2)
+
+        assert len(produced) <= AS_CHUNKS_MAX_BUFFER + 10
+        chunks.close()
+
+    def test_as_chunks_views(self):
+        data = bytearray(b"abcdefg")
+
+        chunks = list(as_chunks(3, data, views=True))
+
+        assert all(isinstance(chunk, memoryview) for chunk in chunks)
+        assert [bytes(chunk) for chunk in chunks] == [b"abc", b"def", b"g"]
+
+        data[0] = ord("z")
+        assert bytes(chunks[0]) == b"zbc"
+
+        numbers = array("i", range(5))
+        chunks = list(as_chunks(2, numbers, views=True))
+
+        assert [chunk.tolist() for chunk in chunks] == [[0, 1], [2, 3], [4]]
+
+        assert list(as_chunks(2, [1, 2, 3], views=True)) == [range(0, 2), range(2, 3)]
+        assert list(as_chunks(2, b"", views=True)) == []
+
+        with pytest.raises(TypeError):
+            list(as_chunks(2, iter([1, 2, 3]), views=True))
+
+        with pytest.raises(TypeError):
+            list(as_chunks(2, b"test", max_weight=4, views=True))
+
     def test_as_reconciled_chunks(self):
         data = [1, 2, 3, 4, 5, 6]
 
@@ -87,6 +203,84 @@ class TestIter(object):
                 (6, True),
             ]
 
+    def test_as_reconciled_chunks_executor(self):
+        data = list(range(50))
+        calls = []
+
+        def work(chunk):
+            calls.append(chunk)
+            sleep(0.001 * (len(calls) % 3))
+            return {n: n * 2 for n in chunk}
+
+        def reconcile(data, item):
+            return data[item]
+
+        expected = [(n, n * 2) for n in data]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for size in [1, 3, 7, 50]:
+                for max_in_flight in [1, 2, 8]:
+                    assert (
+                        list(
+                            as_reconciled_chunks(
+                                size,
+                                data,
+                                work,
+                                reconcile,
+                                executor=executor,
+                                max_in_flight=max_in_flight,
+                            )
+                        )
+                        == expected
+                    )
+
+            with pytest.raises(TypeError):
+                list(as_reconciled_chunks(1, data, work, reconcile, executor=executor))
+
+            with pytest.raises(TypeError):
+                list(
+                    as_reconciled_chunks(
+                        1, data, work, reconcile, executor=executor, max_in_flight=0
+                    )
+                )
+
+    def test_as_reconciled_chunks_overlap(self):
+        running = 0
+        max_running = 0
+        lock = Lock()
+
+        def work(chunk):
+            nonlocal running, max_running
+
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+
+            sleep(0.05)
+
+            with lock:
+                running -= 1
+
+            return {n: n for n in chunk}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            start = perf_counter()
+            result = list(
+                as_reconciled_chunks(
+                    1,
+                    range(8),
+                    work,
+                    lambda d, n: d[n],
+                    executor=executor,
+                    max_in_flight=8,
+                )
+            )
+            elapsed = perf_counter() - start
+
+        assert result == [(n, n) for n in range(8)]
+        assert max_running > 1
+        assert elapsed < 8 * 0.05
+
     def test_outer_zip(self):
         data = [("one", 1), ("two", 2), ("three", 3)]
 
@@ -102,6 +296,74 @@ class TestIter(object):
 
         assert output == [("one", 2), ("two", 4), ("three", 6)]
 
+    def test_outer_zip_tagged(self):
+        data = [("item-%i" % i, i) for i in range(30)]
+        expected = [(item, item[1] * 2) for item in data]
+
+        def double(pair):
+            i, n = pair
+            sleep(0.001 * (n % 3))
+            return i, n * 2
+
+        def reversed_chunks(pairs):
+            for chunk in as_chunks(3, pairs):
+                yield from (double(pair) for pair in reversed(chunk))
+
+        assert (
+            list(outer_zip(data, key=itemgetter(1), work=reversed_chunks, tagged=True))
+            == expected
+        )
+        assert (
+            list(
+                outer_zip(
+                    data,
+                    key=itemgetter(1),
+                    work=reversed_chunks,
+                    tagged=True,
+                    buffer_size=4,
+                )
+            )
+            == expected
+        )
+
+        with pytest.raises(RuntimeError):
+            list(
+                outer_zip(
+                    data,
+                    key=itemgetter(1),
+                    work=reversed_chunks,
+                    tagged=True,
+                    buffer_size=3,
+                )
+            )
+
+        with ThreadPool(4) as pool:
+
+            def work(pairs):
+                return pool.imap_unordered(double, pairs)
+
+            assert (
+                list(
+                    outer_zip(
+                        data, key=itemgetter(1), work=work, tagged=True, buffer_size=5
+                    )
+                )
+                == expected
+            )
+
+            unordered = list(
+                outer_zip(
+                    data,
+                    key=itemgetter(1),
+                    work=work,
+                    tagged=True,
+                    ordered=False,
+                    buffer_size=5,
+                )
+            )
+
+            assert sorted(unordered, key=lambda p: p[0][1]) == expected
+
     def test_as_grams(self):
         for i in range(4):
             assert tuple(as_grams(i + 1, STRING)) == STRING_TESTS[i]
@@ -131,6 +393,123 @@ class TestIter(object):
             (6, 8),
         ]
 
+    def test_as_grams_views(self):
+        data = b"Bonjour"
+
+        for i in range(4):
+            grams = list(as_grams(i + 1, data, views=True))
+
+            assert all(isinstance(gram, memoryview) for gram in grams)
+            assert tuple(bytes(gram).decode() for gram in grams) == STRING_TESTS[i]
+
+        assert [bytes(g) for g in as_grams(4, b"te", views=True)] == [b"te"]
+        assert list(as_grams(4, b"", views=True)) == []
+
+        assert list(as_grams(2, SENTENCE[:3], views=True)) == [range(0, 2), range(1, 3)]
+
+        numbers = array("d", [1.0, 2.0, 3.0])
+
+        assert [g.tolist() for g in as_grams(2, numbers, views=True)] == [
+            [1.0, 2.0],
+            [2.0, 3.0],
+        ]
+
+        with pytest.raises(TypeError):
+            list(as_grams(2, iter(SENTENCE), views=True))
+
+    def test_as_multi_grams(self):
+        with pytest.raises(TypeError):
+            list(as_multi_grams([], STRING))
+
+        with pytest.raises(TypeError):
+            list(as_multi_grams([0, 1], STRING))
+
+        assert list(as_multi_grams(range(1, 3), "abc")) == [
+            "a",
+            "b",
+            "ab",
+            "c",
+            "bc",
+        ]
+
+        assert list(as_multi_grams([1, 2], iter("abc"))) == [
+            ("a",),
+            ("b",),
+            ("a", "b"),
+            ("c",),
+            ("b", "c"),
+        ]
+
+        for target in [STRING, SENTENCE, STRING[:2], SENTENCE[:3], "", ()]:
+            for sizes in [[1], [2, 4], range(1, 6), [3, 9]]:
+                expected = sorted(
+                    gram for size in sizes for gram in as_grams(size, target)
+                )
+
+                assert sorted(as_multi_grams(sizes, target)) == expected
+                assert sorted(as_multi_grams(sizes, iter(target))) == sorted(
+                    gram for size in sizes for gram in as_grams(size, iter(target))
+                )
+
+    def test_as_strided_grams(self):
+        np = pytest.importorskip("numpy")
+
+        data = np.arange(6)
+        windows = as_strided_grams(3, data)
+
+        assert windows.shape == (4, 3)
+        assert windows.tolist() == [list(g) for g in as_grams(3, data.tolist())]
+        assert np.shares_memory(windows, data)
+        assert windows.sum(axis=1).tolist() == [3, 6, 9, 12]
+
+        numbers = array("d", [1.0, 2.0, 3.0])
+        windows = as_strided_grams(2, numbers)
+
+        assert windows.tolist() == [[1.0, 2.0], [2.0, 3.0]]
+
+        numbers[0] = 10.0
+        assert windows[0, 0] == 10.0
+
+        assert as_strided_grams(4, data[:2]).shape == (0, 4)
+
+        with pytest.raises(ValueError):
+            windows[0, 0] = 5
+
+        with pytest.raises(TypeError):
+            as_strided_grams(2, np.zeros((2, 2)))
+
+    def test_as_hashed_grams(self):
+        for size in [0, -1]:
+            with pytest.raises(TypeError):
+                list(as_hashed_grams(size, "abc"))
+
+        def polynomial_hash(gram, key, base=1000003, modulus=(1 << 61) - 1):
+            h = 0
+
+            for item in gram:
+                h = (h * base + key(item)) % modulus
+
+            return h
+
+        for i in range(4):
+            assert list(as_hashed_grams(i + 1, STRING)) == [
+                polynomial_hash(gram, ord) for gram in as_grams(i + 1, STRING)
+            ]
+
+            assert list(as_hashed_grams(i + 1, iter(SENTENCE), key=len)) == [
+                polynomial_hash(gram, len) for gram in as_grams(i + 1, SENTENCE)
+            ]
+
+        assert list(as_hashed_grams(4, "te")) == [polynomial_hash("te", ord)]
+        assert list(as_hashed_grams(4, "")) == []
+
+        hashes = list(as_hashed_grams(2, "abab"))
+        assert hashes[0] == hashes[2] != hashes[1]
+
+        assert list(as_hashed_grams(2, [-1, -2, -1, -2])) == list(
+            as_hashed_grams(2, [-1, -2, -1, -2], key=hash)
+        )
+
     def test_fail_fast(self):
         def hellraiser():
             raise RuntimeError
@@ -145,6 +524,84 @@ class TestIter(object):
         assert list(fail_fast([1])) == [1]
         assert list(fail_fast([])) == []
 
+        def late_hellraiser():
+            yield 1
+            yield 2
+            raise RuntimeError
+
+        gen = fail_fast(late_hellraiser())
+
+        assert next(gen) == 1
+
+        with pytest.raises(RuntimeError):
+            fail_fast(late_hellraiser(), warmup=3)
+
+        with pytest.raises(TypeError):
+            fail_fast([1, 2], warmup=0)
+
+        assert list(fail_fast([1, 2, 3, 4], warmup=2)) == [1, 2, 3, 4]
+        assert list(fail_fast([1], warmup=5)) == [1]
+        assert list(fail_fast([], warmup=5)) == []
+
+    def test_prefetch(self):
+        with pytest.raises(TypeError):
+            prefetch([], 0)
+
+        assert list(prefetch(range(10))) == list(range(10))
+        assert list(prefetch(range(10), 4)) == list(range(10))
+        assert list(prefetch([])) == []
+
+        def hellraiser():
+            yield 1
+            yield 2
+            raise RuntimeError
+
+        consumed = []
+
+        with pytest.raises(RuntimeError):
+            for item in prefetch(hellraiser(), 10):
+                consumed.append(item)
+
+        assert consumed == [1, 2]
+
+        produced = []
+
+        def producer():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        iterator = prefetch(producer(), 5)
+        assert next(iterator) == 0
+
+        sleep(0.05)
+
+        assert len(produced) <= 8
+        iterator.close()
+
+    def test_prefetch_release(self):
+        closed = []
+
+        def producer():
+            try:
+                yield from range(1000)
+            finally:
+                closed.append(True)
+
+        # NOTE: dropped without ever being advanced
+        for _ in range(5):
+            prefetch(producer())
+
+        gc.collect()
+
+        for _ in range(50):
+            if len(closed) == 5:
+                break
+
+            sleep(0.05)
+
+        assert len(closed) == 5
+
     def test_uniq(self):
         a = [1, 1, 2, 2, 2, 2, 3, 4, 4, 5, 2]
 
@@ -178,6 +635,15 @@ class TestIter(object):
         result = list(distinct(range(4), key=lambda x: x % 2))
         assert result == [0, 1]
 
+        result = list(distinct(a, partial(BloomFilter, 100, 0.001)))
+        assert result == [(1, 4), (1, 5), (2, 3), (4, 5), (2, 7), (6, 8)]
+
+        result = list(distinct([1, 2, 1, 3, 3, 1, 2], partial(RecentSet, 1)))
+        assert result == [1, 2, 1, 3, 1, 2]
+
+        result = list(distinct([1, 2, 1, 3, 3, 1, 2], partial(RecentSet, 2)))
+        assert result == [1, 2, 3, 2]
+
     def test_with_prev(self):
         a = [1, 2, 3, 4]
 
@@ -274,3 +740,77 @@ class TestIter(object):
         assert list(without_last([1])) == []
 
         assert list(without_last([])) == []
+
+    def test_pipeline(self):
+        with pytest.raises(TypeError):
+            Pipeline().as_chunks(0)
+
+        stages = {
+            "map": (lambda p: p.map(str), lambda it: map(str, it)),
+            "filter": (
+                lambda p: p.filter(lambda x: len(str(x)) % 3),
+                lambda it: filter(lambda x: len(str(x)) % 3, it),
+            ),
+            "uniq": (lambda p: p.uniq(), uniq),
+            "uniq_key": (
+                lambda p: p.uniq(key=lambda x: str(x)[:2]),
+                lambda it: uniq(it, key=lambda x: str(x)[:2]),
+            ),
+            "distinct": (lambda p: p.distinct(), distinct),
+            "distinct_key": (
+                lambda p: p.distinct(key=lambda x: str(x)[-1]),
+                lambda it: distinct(it, key=lambda x: str(x)[-1]),
+            ),
+            "with_prev": (lambda p: p.with_prev(), with_prev),
+            "with_next": (lambda p: p.with_next(), with_next),
+            "with_prev_and_next": (
+                lambda p: p.with_prev_and_next(),
+                with_prev_and_next,
+            ),
+            "with_is_first": (lambda p: p.with_is_first(), with_is_first),
+            "with_is_last": (lambda p: p.with_is_last(), with_is_last),
+            "without_first": (lambda p: p.without_first(), without_first),
+            "without_last": (lambda p: p.without_last(), without_last),
+            "as_chunks": (
+                lambda p: p.as_chunks(3).map(tuple),
+                lambda it: map(tuple, as_chunks(3, it)),
+            ),
+        }
+
+        names = sorted(stages)
+        data = [1, 1, 2, 3, 3, 3, 4, 1, 5, 5, 6, 2, 7]
+        inputs = [data, data[:1], data[:2], []]
+
+        combinations = [[name] for name in names]
+        combinations += [[a, b] for a in names for b in names]
+        combinations += [
+            ["with_prev", "uniq", "distinct"],
+            ["with_is_last", "as_chunks", "with_next", "without_last"],
+            ["as_chunks", "with_is_last", "with_prev_and_next", "with_is_last"],
+        ]
+
+        for combination in combinations:
+            pipeline = Pipeline()
+
+            for name in combination:
+                pipeline = stages[name][0](pipeline)
+
+            for target in inputs:
+                expected = iter(target)
+
+                for name in combination:
+                    expected = stages[name][1](expected)
+
+                assert list(pipeline(target)) == list(expected), combination
+
+        assert list(Pipeline()(data)) == data
+
+        deep = Pipeline()
+
+        for _ in range(96):
+            deep = deep.filter(bool)
+
+        assert list(deep([0, 1, 2])) == [1, 2]
+
+        with pytest.raises(TypeError):
+            deep.filter(bool).filter(bool)([1])
@@ -0,0 +1,125 @@
+# =============================================================================
+# Ebbe Set-like Data Structures Unit Tests
+# =============================================================================
+import pytest
+from time import sleep
+
+from ebbe import BloomFilter, RecentSet, DigestSet, distinct
+
+
+class TestSets(object):
+    def test_bloom_filter(self):
+        with pytest.raises(TypeError):
+            BloomFilter(0)
+
+        with pytest.raises(TypeError):
+            BloomFilter(10, error_rate=1)
+
+        bloom = BloomFilter(1000, error_rate=0.01)
+
+        for i in range(1000):
+            bloom.add("item-%i" % i)
+
+        assert all(("item-%i" % i) in bloom for i in range(1000))
+
+        false_positives = sum(1 for i in range(10000) if ("other-%i" % i) in bloom)
+
+        assert false_positives < 300
+        assert 950 <= len(bloom) <= 1000
+        assert bloom.nbytes == (bloom.size + 7) // 8
+
+    def test_recent_set(self):
+        with pytest.raises(TypeError):
+            RecentSet()
+
+        recent = RecentSet(2)
+
+        recent.add(1)
+        recent.add(2)
+        assert 1 in recent
+
+        recent.add(3)
+        assert 2 not in recent
+        assert 1 in recent
+        assert 3 in recent
+        assert len(recent) == 2
+
+        recent = RecentSet(ttl=0.05)
+        recent.add(1)
+
+        assert 1 in recent
+
+        sleep(0.1)
+
+        assert 1 not in recent
+        assert len(recent) == 0
+
+    def test_digest_set(self):
+        with pytest.raises(TypeError):
+            DigestSet(bits=32)
+
+        for bits in [64, 128]:
+            digests = DigestSet(bits=bits, capacity=4)
+
+            for i in range(1000):
+                digests.add("https://example.com/%i" % i)
+                digests.add("https://example.com/%i" % i)
+
+            assert len(digests) == 1000
+            assert all(("https://example.com/%i" % i) in digests for i in range(1000))
+            assert not any(
+                ("https://example.org/%i" % i) in digests for i in range(1000)
+            )
+            assert digests.nbytes == digests.size * bits // 8
+
+        digests = DigestSet()
+        digests.add("a")
+
+        assert b"a" not in digests
+        assert ("a", 1) not in digests
+
+        items = ["a", b"a", ("a", 1), "a", ("a", 1), 3, ("a", (1, "b")), ("a", 1, "b")]
+
+        assert list(distinct(items, DigestSet)) == list(distinct(items))
+
+        items = [1, True, 1, 2, b"x", ("a", "b"), ("ab",), -1]
+
+        assert list(distinct(items, DigestSet)) == list(distinct(items))
+
+        digests = DigestSet()
+        digests.add(bytearray(b"x"))
+
+        assert b"x" in digests
+
+    def test_digest_set_unsupported_types(self):
+        class Record(object):
+            pass
+
+        digests = DigestSet()
+
+        for item in [1.0, None, Record(), ("a", 1.5), frozenset([1])]:
+            with pytest.raises(TypeError):
+                digests.add(item)
+
+            with pytest.raises(TypeError):
+                item in digests
+
+        with pytest.raises(TypeError):
+            list(distinct([Record(), Record()], DigestSet))
+
+    def test_digest_set_key(self):
+        class Record(object):
+            def __init__(self, id):
+                self.id = id
+
+        records = [Record(i % 500) for i in range(1000)]
+        digests = DigestSet(key=lambda r: "record-%i" % r.id)
+
+        assert len(list(distinct(records, lambda: digests))) == 500
+        assert Record(3) in digests
+        assert Record(501) not in digests
+
+        digests = DigestSet(key=lambda r: r.id)
+
+        with pytest.raises(TypeError):
+            digests.add(Record(1))
@@ -2,7 +2,9 @@
 # Ebbe Utilities Unit Tests
 # =============================================================================
 import pytest
+from array import array
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from itertools import chain
 
 from ebbe import (
@@ -12,16 +14,27 @@ from ebbe import (
     pathgetter,
     pathsgetter,
     sorted_uniq,
+    external_sorted_uniq,
+    minhash,
+    as_hashed_grams,
     indexed,
     grouped,
     partitioned,
     grouped_items,
     partitioned_items,
+    parallel_grouped,
+    parallel_partitioned,
+    external_grouped,
+    external_grouped_items,
     pick,
     omit,
 )
 
 
+def parity(x):
+    return x % 2
+
+
 class Container(object):
     def __init__(self, value, recurse=True):
         self.value = value
@@ -53,6 +66,16 @@ class TestUtils(object):
         assert getter("l")(NESTED_OBJECT, 28) == 28
         assert getter("l", 27)(NESTED_OBJECT, 28) == 28
 
+    def test_getter_batch(self):
+        records = [{"n": 1}, {"n": 2}, {}, {"n": 4}]
+
+        assert getter("n").batch(records) == [1, 2, None, 4]
+        assert getter("n", 0).batch(iter(records)) == [1, 2, 0, 4]
+        assert getter("n").batch(records, 3) == [1, 2, 3, 4]
+        assert getter("n").batch(records, 0, typecode="i") == array("i", [1, 2, 0, 4])
+        assert getter(1).batch([[0, 1], [0]]) == [1, None]
+        assert getter("n").batch([]) == []
+
     def test_getpath(self):
         with pytest.raises(TypeError):
             getpath(NESTED_OBJECT, "test")
@@ -121,6 +144,129 @@ class TestUtils(object):
         assert default_getter(NESTED_OBJECT) == 5
         assert default_getter({}) == 1337
 
+        with pytest.raises(TypeError):
+            pathgetter("a.d.e")
+
+        parsed_getter = pathgetter("a.b.1", split_char=".", parse_indices=True)
+
+        assert parsed_getter(NESTED_OBJECT) == 45
+        assert parsed_getter(NESTED_OBJECT) == 45
+
+    def test_pathgetter_consistency(self):
+        paths = [
+            ["a", "d", "e"],
+            ["a", "c"],
+            ["a", "b", 1],
+            ["a", "b", -1, "f", -1],
+            ["a", "b", 7],
+            ["a", "b", "test"],
+            ["t", "u"],
+            ["a", "d", "g", "numbers", 1],
+            ["a", "d", "g", "recursion", "numbers"],
+            ["a", "d", "g", 3],
+            ["value"],
+            [],
+        ]
+
+        targets = [NESTED_OBJECT, NESTED_OBJECT["a"]["d"]["g"], None, 45, [[1, 2]]]
+
+        for items, attributes in [
+            (True, False),
+            (False, True),
+            (True, True),
+            (False, False),
+        ]:
+            for path in paths:
+                get_path = pathgetter(path, items=items, attributes=attributes)
+
+                for target in targets:
+                    expected = getpath(
+                        target, path, 67, items=items, attributes=attributes
+                    )
+
+                    assert get_path(target, 67) == expected
+
+    def test_pathsgetter(self):
+        paths = [
+            ["a", "b", 0, "c"],
+            ["a", "b", 2, "f", 1],
+            ["a", "d", "e"],
+            ["a", "b", 7, "c"],
+            ["a", "d", "e"],
+            ["t"],
+            [],
+            ["a", "d", "g", "recursion", "value"],
+        ]
+
+        get_paths = pathsgetter(*paths)
+
+        assert get_paths(NESTED_OBJECT) == (4, 2, 5, None, 5, 32, NESTED_OBJECT, None)
+        assert get_paths({}, 12) == (12, 12, 12, 12, 12, 12, {}, 12)
+
+        get_paths = pathsgetter(*paths, attributes=True, default=-1)
+
+        assert get_paths(NESTED_OBJECT) == (4, 2, 5, -1, 5, 32, NESTED_OBJECT, 45)
+
+        get_paths = pathsgetter("a.b.1", "a.b.0.c", split_char=".", parse_indices=True)
+
+        assert get_paths(NESTED_OBJECT) == (45, 4)
+        assert get_paths(NESTED_OBJECT) == (45, 4)
+
+        with pytest.raises(TypeError):
+            pathsgetter("a.b")
+
+    def test_pathgetter_batch(self):
+        records = [{"a": {"b": [1, 2]}}, {"a": {"b": [4]}}, {"a": None}]
+
+        assert pathgetter(["a", "b", 0]).batch(records) == [1, 4, None]
+        assert pathgetter(["a", "b", 1]).batch(records, 0) == [2, 0, 0]
+        assert pathgetter(["a", "b", 0], default=0).batch(
+            iter(records), typecode="q"
+        ) == array("q", [1, 4, 0])
+
+        columns = pathsgetter(["a", "b", 0], ["a", "b", 1]).batch(records, 0)
+
+        assert columns == ([1, 4, 0], [2, 0, 0])
+        assert pathsgetter(["a"], ["b"]).batch([]) == ([], [])
+
+        # Falling back after a failed optimistic pass on an iterator
+        assert pathgetter(["a", "b", 1]).batch(iter(records)) == [2, None, None]
+        assert pathgetter([]).batch(iter(records)) == records
+
+        # Batches must be consistent with per-record lookups
+        records = [
+            {"a": {"b": [1, 2], "c": "x"}, "d": 3},
+            {"a": {"b": [4]}},
+            {"a": {"c": "y"}, "d": [5]},
+            {"a": [0, 1]},
+            {},
+            None,
+            "abc",
+        ]
+        paths = [["a", "b", 0], ["a", "b", 1], ["a", "c"], ["a"], ["d", 0], []]
+
+        getter = pathsgetter(*paths, default=-1)
+        columns = getter.batch(iter(records))
+
+        assert columns == tuple(list(c) for c in zip(*(getter(r) for r in records)))
+
+        for path, column in zip(paths, columns):
+            assert pathgetter(path, default=-1).batch(records) == list(column)
+
+    def test_batch_numpy(self):
+        np = pytest.importorskip("numpy")
+
+        records = [{"n": 1.5}, {"n": 2.5}, {}]
+
+        column = getter("n", 0.0).batch(records, numpy=True)
+
+        assert isinstance(column, np.ndarray)
+        assert column.tolist() == [1.5, 2.5, 0.0]
+
+        column = pathgetter(["n"], default=0).batch(records, typecode="d", numpy=True)
+
+        assert column.dtype == np.float64
+
     def test_sorted_uniq(self):
         numbers = [3, 17, 3, 4, 1, 4, 5, 5, 1, -1, 5]
 
@@ -131,6 +277,58 @@ class TestUtils(object):
 
         assert sorted_uniq(tuples, key=getter(1)) == [(1, 2), (1, 5), (1, 6), (11, 23)]
 
+    def test_external_sorted_uniq(self):
+        with pytest.raises(TypeError):
+            external_sorted_uniq(None)
+
+        with pytest.raises(TypeError):
+            external_sorted_uniq([], buffer_size=0)
+
+        numbers = [3, 17, 3, 4, 1, 4, 5, 5, 1, -1, 5]
+
+        for buffer_size in [1, 2, 3, 100]:
+            for reverse in [False, True]:
+                assert list(
+                    external_sorted_uniq(
+                        numbers, reverse=reverse, buffer_size=buffer_size
+                    )
+                ) == sorted_uniq(numbers, reverse=reverse)
+
+        tuples = [(11, 23), (1, 2), (2, 2), (3, 2), (1, 5), (1, 6)]
+
+        assert list(
+            external_sorted_uniq(tuples, key=getter(1), buffer_size=2)
+        ) == sorted_uniq(tuples, key=getter(1))
+
+        assert list(external_sorted_uniq([1, 1, 2, 3, 3, 3, 4], presorted=True)) == [
+            1,
+            2,
+            3,
+            4,
+        ]
+
+        assert list(external_sorted_uniq([])) == []
+
+    def test_minhash(self):
+        with pytest.raises(TypeError):
+            minhash([], 0)
+
+        def similarity(a, b):
+            return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+        text = "the quick brown fox jumps over the lazy dog " * 3
+        other = text.replace("lazy", "sleepy")
+        unrelated = "lorem ipsum dolor sit amet, consectetur adipiscing elit"
+
+        signature = minhash(as_hashed_grams(5, text))
+
+        assert len(signature) == 128
+        assert signature == minhash(as_hashed_grams(5, text))
+        assert signature != minhash(as_hashed_grams(5, text), seed=1)
+
+        assert similarity(signature, minhash(as_hashed_grams(5, other))) > 0.5
+        assert similarity(signature, minhash(as_hashed_grams(5, unrelated))) < 0.2
+
     def test_indexed(self):
         with pytest.raises(TypeError):
             indexed(None)
@@ -191,6 +389,48 @@ class TestUtils(object):
             "not-ok": {0, 1, 4},
         }
 
+    def test_grouped_reducer(self):
+        with pytest.raises(TypeError):
+            grouped([], reducer="unknown")
+
+        with pytest.raises(TypeError):
+            grouped([], reducer=3)
+
+        data = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3]
+
+        assert grouped(data, key=parity, reducer="count") == {1: 7, 0: 3}
+        assert grouped(data, key=parity, reducer="sum") == {1: 27, 0: 12}
+        assert grouped(data, key=parity, reducer="min") == {1: 1, 0: 2}
+        assert grouped(data, key=parity, reducer="max") == {1: 9, 0: 6}
+        assert grouped(data, key=parity, reducer="first") == {1: 3, 0: 4}
+        assert grouped(data, key=parity, reducer="last") == {1: 3, 0: 6}
+        assert grouped(data, key=parity, reducer="sum", initializer=100) == {
+            1: 127,
+            0: 112,
+        }
+
+        assert grouped(
+            data, key=parity, value=lambda x: x * 10, reducer=lambda a, b: a + b
+        ) == {1: 270, 0: 120}
+
+        def top2(acc, v):
+            return tuple(sorted(acc + (v,), reverse=True)[:2])
+
+        assert grouped(data, key=parity, reducer=top2, initializer=()) == {
+            1: (9, 5),
+            0: (6, 4),
+        }
+
+        assert grouped_items(
+            ((parity(x), x) for x in data), reducer="count"
+        ) == grouped(data, key=parity, reducer="count")
+
+        assert partitioned(data, key=parity, reducer="max") == [9, 6]
+        assert partitioned_items(((parity(x), x) for x in data), reducer="min") == [
+            1,
+            2,
+        ]
+
     def test_partitioned(self):
         with pytest.raises(TypeError):
             partitioned(None)
@@ -228,6 +468,89 @@ class TestUtils(object):
             {2, 3},
         ]
 
+    def test_parallel_grouped(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            with pytest.raises(TypeError):
+                parallel_grouped(None, executor=executor)
+
+            with pytest.raises(TypeError):
+                parallel_grouped([], key="test", executor=executor)
+
+            with pytest.raises(TypeError):
+                parallel_grouped([], container=tuple, executor=executor)
+
+            with pytest.raises(TypeError):
+                parallel_grouped([], executor=executor, max_in_flight=0)
+
+            with pytest.raises(TypeError):
+                parallel_grouped([])
+
+            with pytest.raises(TypeError):
+                parallel_grouped([], executor=None)
+
+            data = [(i * 7) % 13 for i in range(100)]
+
+            def key(x):
+                return x % 3
+
+            assert parallel_grouped(
+                data, key=key, chunk_size=7, executor=executor
+            ) == grouped(data, key=key)
+            assert list(
+                parallel_grouped(data, chunk_size=3, executor=executor)
+            ) == list(grouped(data))
+            assert parallel_grouped(
+                data,
+                container=set,
+                key=key,
+                chunk_size=9,
+                executor=executor,
+                max_in_flight=1,
+            ) == grouped(data, container=set, key=key)
+
+            assert parallel_partitioned(
+                data, key=key, chunk_size=5, executor=executor
+            ) == partitioned(data, key=key)
+
+            assert parallel_grouped([], executor=executor) == {}
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            assert parallel_grouped(
+                range(50), key=parity, chunk_size=10, executor=executor
+            ) == grouped(range(50), key=parity)
+
+    def test_external_grouped(self):
+        with pytest.raises(TypeError):
+            external_grouped(None)
+
+        with pytest.raises(TypeError):
+            external_grouped([], container=tuple)
+
+        with pytest.raises(TypeError):
+            external_grouped([], max_items=0)
+
+        data = [(i * 7) % 13 for i in range(100)]
+
+        def key(x):
+            return x % 5
+
+        expected = sorted(grouped(data, key=key).items())
+
+        assert list(external_grouped(data, key=key)) == expected
+        assert list(external_grouped(data, key=key, max_items=7)) == expected
+        assert list(external_grouped(data, key=key, max_groups=2)) == expected
+
+        assert list(
+            external_grouped(data, set, key=key, value=str, max_items=3)
+        ) == sorted(grouped(data, container=set, key=key, value=str).items())
+
+        assert (
+            list(external_grouped_items(((key(x), x) for x in data), max_items=10))
+            == expected
+        )
+
+        assert list(external_grouped([])) == []
+
     def test_pick(self):
         d = {"a": 1, "b": 2, "c": 3}
 